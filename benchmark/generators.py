@@ -0,0 +1,138 @@
+import heapq
+import random
+from math import inf
+
+
+def write_state_space(
+    ss_path: str, h_path: str, initial_state: str, goal_states: list, edges: dict, h
+):
+    with open(ss_path, "w", encoding="utf-8") as f:
+        f.write(f"{initial_state}\n{' '.join(goal_states)}\n")
+        for state, children in edges.items():
+            transitions = " ".join(f"{child},{cost}" for child, cost in children)
+            f.write(f"{state}: {transitions}".rstrip() + "\n")
+    with open(h_path, "w", encoding="utf-8") as f:
+        for state in edges:
+            f.write(f"{state}: {h[state]}\n")
+
+
+def grid_state_space(ss_path: str, h_path: str, size: int, seed: int = 0):
+    rng = random.Random(seed)
+    edges = dict()
+    for row in range(size):
+        for col in range(size):
+            children = list()
+            for d_row, d_col in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                if 0 <= row + d_row < size and 0 <= col + d_col < size:
+                    # only backward moves are dropped, so the goal stays reachable
+                    if d_row + d_col < 0 and rng.random() < 0.3:
+                        continue
+                    children.append(
+                        (f"c{row + d_row}_{col + d_col}", rng.randint(1, 9))
+                    )
+            edges[f"c{row}_{col}"] = children
+    goal_row = goal_col = size - 1
+    # every step costs at least 1, so the manhattan distance never overestimates
+    h = {
+        f"c{row}_{col}": abs(goal_row - row) + abs(goal_col - col)
+        for row in range(size)
+        for col in range(size)
+    }
+    write_state_space(ss_path, h_path, "c0_0", [f"c{goal_row}_{goal_col}"], edges, h)
+
+
+def shortest_distances(edges: dict, goal_states: list) -> dict:
+    reverse_edges = {state: list() for state in edges}
+    for state, children in edges.items():
+        for child, cost in children:
+            reverse_edges[child].append((state, cost))
+    distances = {state: 0 for state in goal_states}
+    open_list = [(0, state) for state in goal_states]
+    while open_list:
+        distance, state = heapq.heappop(open_list)
+        if distance > distances[state]:
+            continue
+        for parent, cost in reverse_edges[state]:
+            if distance + cost < distances.get(parent, inf):
+                distances[parent] = distance + cost
+                heapq.heappush(open_list, (distance + cost, parent))
+    return distances
+
+
+def random_state_space(
+    ss_path: str, h_path: str, size: int, degree: int = 3, seed: int = 0
+):
+    rng = random.Random(seed)
+    states = [f"s{index}" for index in range(size)]
+    rng.shuffle(states)
+    edges = dict()
+    for index, state in enumerate(states):
+        children = dict()
+        # a chain through all states keeps every goal reachable
+        if index + 1 < size:
+            children[states[index + 1]] = rng.randint(5, 30)
+        for _ in range(rng.randint(0, degree)):
+            child = rng.choice(states)
+            if child != state and child not in children:
+                children[child] = rng.randint(1, 20)
+        edges[state] = list(children.items())
+    goal_states = rng.sample(states[size // 2 :], min(2, size - size // 2))
+    distances = shortest_distances(edges, goal_states)
+    # scaling the true distance keeps the heuristic admissible and consistent
+    h = {state: int(distances.get(state, 0) * 0.7) for state in states}
+    write_state_space(ss_path, h_path, states[0], goal_states, edges, h)
+
+
+def cnf_clauses(clauses_path: str, size: int, k: int = 3, seed: int = 0):
+    rng = random.Random(seed)
+    atoms = [f"a{index}" for index in range(max(size, k))]
+    rng.shuffle(atoms)
+    # a planted implication chain makes the goal provable, the random
+    # k-clauses around it are what the prover has to search through
+    lines = [atoms[0]]
+    lines.extend(f"~{x} v {y}" for x, y in zip(atoms, atoms[1 : size // 2]))
+    for _ in range(size):
+        literals = [
+            literal if rng.random() < 0.5 else f"~{literal}"
+            for literal in rng.sample(atoms, k)
+        ]
+        # keeping a positive literal in every clause leaves the all-true
+        # assignment as a model, so the knowledge base stays consistent
+        literals[0] = literals[0].lstrip("~")
+        lines.append(" v ".join(literals))
+    rng.shuffle(lines)
+    lines.append(atoms[max(size // 2 - 1, 0)])
+    with open(clauses_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def categorical_dataset(
+    train_path: str,
+    test_path: str,
+    size: int,
+    features: int = 6,
+    values: int = 3,
+    classes: int = 2,
+    seed: int = 0,
+):
+    rng = random.Random(seed)
+    names = [f"f{index}" for index in range(features)]
+    domains = [[f"v{index}" for index in range(values)] for _ in names]
+    labels = [f"c{index}" for index in range(classes)]
+    relevant = rng.sample(range(features), min(3, features))
+    weights = {index: rng.randint(1, max(classes - 1, 1)) for index in relevant}
+
+    def row():
+        sample = [rng.choice(domain) for domain in domains]
+        label = sum(
+            weights[index] * domains[index].index(sample[index]) for index in relevant
+        )
+        if rng.random() < 0.1:
+            label = rng.randrange(classes)
+        return sample + [labels[label % classes]]
+
+    for path, rows in ((train_path, size), (test_path, max(size // 4, 1))):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(",".join(names + ["label"]) + "\n")
+            for _ in range(rows):
+                f.write(",".join(row()) + "\n")
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark.generators import (
+    categorical_dataset,
+    cnf_clauses,
+    grid_state_space,
+    random_state_space,
+)
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+lab_paths = {
+    lab: os.path.join(repo_root, f"{lab}py", "solution.py")
+    for lab in ("lab1", "lab2", "lab3")
+}
+default_sizes = {"lab1": [10, 30, 100], "lab2": [16, 32, 48], "lab3": [100, 1000, 5000]}
+
+
+def lab1_cases(workdir: str, size: int, seed: int):
+    for kind, generator, scaled_size in (
+        ("grid", grid_state_space, size),
+        ("random", random_state_space, size * size),
+    ):
+        ss_path = os.path.join(workdir, f"{kind}{size}.txt")
+        h_path = os.path.join(workdir, f"{kind}{size}_h.txt")
+        generator(ss_path, h_path, scaled_size, seed=seed)
+        for alg in ("bfs", "ucs", "astar"):
+            yield f"{alg}-{kind}", ["--alg", alg, "--ss", ss_path, "--h", h_path]
+
+
+def lab2_cases(workdir: str, size: int, seed: int):
+    clauses_path = os.path.join(workdir, f"cnf{size}.txt")
+    cnf_clauses(clauses_path, size, seed=seed)
+    yield "resolution", ["resolution", clauses_path]
+
+
+def lab3_cases(workdir: str, size: int, seed: int):
+    train_path = os.path.join(workdir, f"train{size}.csv")
+    test_path = os.path.join(workdir, f"test{size}.csv")
+    categorical_dataset(train_path, test_path, size, seed=seed)
+    yield "id3", [train_path, test_path]
+
+
+lab_cases = {"lab1": lab1_cases, "lab2": lab2_cases, "lab3": lab3_cases}
+
+
+def time_case(lab: str, args: list, repeat: int, timeout: float):
+    runs = list()
+    for _ in range(repeat):
+        case_start = time.perf_counter()
+        try:
+            process = subprocess.run(
+                [sys.executable, lab_paths[lab], *args],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return runs, "timeout"
+        runs.append(time.perf_counter() - case_start)
+        if process.returncode != 0:
+            return runs, f"exit {process.returncode}"
+    return runs, "ok"
+
+
+def run_benchmarks(labs: list, sizes: dict, repeat: int, timeout: float, seed: int):
+    results = list()
+    with tempfile.TemporaryDirectory() as workdir:
+        for lab in labs:
+            for size in sizes[lab]:
+                for case, args in lab_cases[lab](workdir, size, seed):
+                    runs, status = time_case(lab, args, repeat, timeout)
+                    result = {
+                        "lab": lab,
+                        "case": case,
+                        "size": size,
+                        "status": status,
+                        "runs": runs,
+                        "median": statistics.median(runs) if runs else None,
+                        "min": min(runs) if runs else None,
+                    }
+                    print(
+                        f"{lab} {case} size={size} status={status} "
+                        + (f"median={result['median']:.4f}s" if runs else "")
+                    )
+                    results.append(result)
+    return results
+
+
+def compare_results(previous: list, current: list):
+    previous_dict = {(x["lab"], x["case"], x["size"]): x for x in previous}
+    print("=" * 15)
+    for result in current:
+        key = (result["lab"], result["case"], result["size"])
+        before = previous_dict.get(key)
+        if before is None or before["median"] is None or result["median"] is None:
+            print(f"{' '.join(map(str, key))}: no comparable result")
+            continue
+        ratio = result["median"] / before["median"]
+        print(
+            f"{' '.join(map(str, key))}: {before['median']:.4f}s -> "
+            f"{result['median']:.4f}s ({ratio:.2f}x)"
+        )
+
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--labs", nargs="+", choices=list(lab_paths), default=None)
+    parser.add_argument("--sizes", metavar="size", type=int, nargs="+")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", metavar="seconds", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", metavar="results_path", default="bench_output.json")
+    parser.add_argument("--compare", metavar="previous_results_path")
+
+    return parser
+
+
+def main():
+    parser = create_parser()
+    args = parser.parse_args()
+    labs = args.labs or list(lab_paths)
+    sizes = {lab: args.sizes or default_sizes[lab] for lab in labs}
+
+    # the earlier run is read first, --out may well point at the same file
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)["results"]
+
+    results = run_benchmarks(labs, sizes, args.repeat, args.timeout, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+    if previous is not None:
+        compare_results(previous, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,75 @@
 import argparse
+import hashlib
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
 import time
-from collections import deque
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import redirect_stdout
+from functools import partial
+from itertools import count
+from math import inf
 import heapq
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 start = time.time()
 measure_time = False
+trace_memory = False
+consistency_check_data = None
+batch_query_data = None
+
+alg_name_dict = {
+    "bfs": "BFS",
+    "ucs": "UCS",
+    "astar": "A-STAR",
+    "bibfs": "BI-BFS",
+    "biucs": "BI-UCS",
+    "idastar": "IDA-STAR",
+    "smastar": "SMA-STAR",
+}
+
+COMPILED_MAGIC = b"LAB1CSR\0"
+COMPILED_VERSION = 2
+COMPILED_HEADER = struct.Struct("=8sIIqqqqq" + "q32s" * 2 + "II")
 
-alg_name_dict = {"bfs": "BFS", "ucs": "UCS", "astar": "A-STAR"}
+
+def memory_limit(value: str) -> int:
+    # argparse turns this into a parser.error for --mem-limit
+    if int(value) < 2:
+        raise argparse.ArgumentTypeError("must hold at least 2 nodes")
+    return int(value)
 
 
 def create_parser():
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("--alg", metavar="algorithm", choices=["bfs", "ucs", "astar"])
+    parser.add_argument("--alg", metavar="algorithm", choices=list(alg_name_dict))
     parser.add_argument("--ss", metavar="state_descriptor", required=True)
     parser.add_argument("--h", metavar="heuristic_descriptor")
     parser.add_argument("--check-optimistic", action="store_true")
     parser.add_argument("--check-consistent", action="store_true")
     parser.add_argument("--t", action="store_true")
+    parser.add_argument("--csr", action="store_true")
+    parser.add_argument("--mmap", action="store_true")
+    parser.add_argument("--compile-ss", metavar="compiled_descriptor")
+    parser.add_argument("--violations-only", action="store_true")
+    parser.add_argument("--workers", metavar="processes", type=int, default=1)
+    parser.add_argument("--mem-limit", metavar="nodes", type=memory_limit)
+    parser.add_argument("--queue", choices=list(queue_dict))
+    parser.add_argument("--queries", metavar="query_descriptor")
+    parser.add_argument("--stats", choices=["json"])
+    parser.add_argument("--trace-memory", action="store_true")
 
     return parser
 
@@ -40,53 +92,374 @@ def print_output(
     )
 
 
+def read_descriptor_lines(path: str, use_mmap: bool = False):
+    if use_mmap and os.path.getsize(path) > 0:
+        with open(path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as m:
+            for line in iter(m.readline, b""):
+                if line[:1] != b"#" and line.strip():
+                    yield line.decode("utf-8").strip()
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line[0] != "#" and line.strip():
+                    yield line.strip()
+
+
+def parse_state_line(line: str):
+    state, separator, successors = line.partition(": ")
+    if not separator:
+        return line[:-1], []
+    return state, [
+        (child_name, float(child_cost))
+        for child_name, _, child_cost in (
+            x.partition(",") for x in successors.split(" ")
+        )
+    ]
+
+
 def generate_state_dict(
-    path: str, sort_children: bool = False, sort_nodes: bool = False
+    path: str,
+    sort_children: bool = False,
+    sort_nodes: bool = False,
+    use_mmap: bool = False,
 ):
-    with open(path, encoding="utf-8") as f:
-        path_data = [x.strip() for x in f.readlines() if x[0] != "#"]
-        initial_state = path_data[0]
-        goal_states = set(path_data[1].split(" "))
-        if sort_children:
-            state_dict = {
-                k: sorted(
-                    tuple(
-                        (y.split(",")[0], float(y.split(",")[1])) for y in v.split(" ")
-                    ),
-                    key=lambda x: x[0],
-                )
-                if len(v) > 0
-                else tuple()
-                for k, v in [
-                    x.split(": ") if len(x.split(": ")) > 1 else [x[:-1], []]
-                    for x in path_data[2:]
-                ]
-            }
-        elif sort_nodes:
-            state_dict = {
-                k: tuple(
-                    (y.split(",")[0], float(y.split(",")[1])) for y in v.split(" ")
-                )
-                if len(v) > 0
-                else tuple()
-                for k, v in [
-                    x.split(": ") if len(x.split(": ")) > 1 else [x[:-1], []]
-                    for x in sorted(path_data[2:])
-                ]
-            }
+    path_data = read_descriptor_lines(path, use_mmap)
+    initial_state = next(path_data)
+    goal_states = set(next(path_data).split(" "))
+    state_dict = dict()
+    for line in path_data:
+        state, children = parse_state_line(line)
+        state_dict[state] = (
+            sorted(children, key=lambda x: x[0]) if sort_children else tuple(children)
+        )
+    if sort_nodes:
+        # matches sorting the raw "state: successors" lines
+        state_dict = dict(sorted(state_dict.items(), key=lambda x: x[0] + ": "))
+    return initial_state, goal_states, state_dict
+
+
+class StateGraph:
+    def __init__(
+        self, names, offsets, targets, costs, initial_state, goal_states, described
+    ):
+        # state ids are positions in the sorted names sequence, so comparing ids
+        # orders states the same way comparing their names does
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+        self.initial_state = initial_state
+        self.goal_states = goal_states
+        # states that have a "state: successors" line, unlike states that only
+        # appear as a successor, an initial state or a goal
+        self.described = described
+        self.__reverse = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def index(self, name: str) -> int:
+        i = bisect_left(self.names, name)
+        if i == len(self.names) or self.names[i] != name:
+            raise KeyError(name)
+        return i
+
+    def edges(self, state: int) -> range:
+        return range(self.offsets[state], self.offsets[state + 1])
+
+    def reverse(self):
+        if self.__reverse is None:
+            self.__reverse = reverse_state_graph(self)
+        return self.__reverse
+
+
+def generate_state_graph(path: str, use_mmap: bool = False):
+    # edges go straight into flat arrays under ids given in order of appearance,
+    # the lines are then laid out again in name order
+    ids = defaultdict(count().__next__)
+    targets = array("i")
+    costs = array("d")
+    line_states = array("i")
+    line_offsets = array("q", [0])
+
+    path_data = read_descriptor_lines(path, use_mmap)
+    initial_state = ids[next(path_data)]
+    goal_states = [ids[x] for x in next(path_data).split(" ")]
+    for line in path_data:
+        state, separator, successors = line.partition(": ")
+        if separator:
+            children = successors.replace(",", " ").split(" ")
+            targets.extend(map(ids.__getitem__, children[0::2]))
+            costs.extend(map(float, children[1::2]))
         else:
-            state_dict = {
-                k: tuple(
-                    (y.split(",")[0], float(y.split(",")[1])) for y in v.split(" ")
-                )
-                if len(v) > 0
-                else tuple()
-                for k, v in [
-                    x.split(": ") if len(x.split(": ")) > 1 else [x[:-1], []]
-                    for x in path_data[2:]
-                ]
-            }
-        return initial_state, goal_states, state_dict
+            state = line[:-1]
+        line_states.append(ids[state])
+        line_offsets.append(len(targets))
+    names = list(ids)
+    # only the positions of the names are needed from here on
+    ids.clear()
+    lines = array("i", [-1]) * len(names)
+    for line, state in enumerate(line_states):
+        lines[state] = line
+    order = sorted(range(len(names)), key=names.__getitem__)
+    rank = array("i", bytes(4 * len(order)))
+    for new_id, old_id in enumerate(order):
+        rank[old_id] = new_id
+    targets = array("i", map(rank.__getitem__, targets))
+
+    offsets = array("q", [0])
+    sorted_targets = array("i")
+    sorted_costs = array("d")
+    described = array("b", bytes(len(order)))
+    for new_id, old_id in enumerate(order):
+        line = lines[old_id]
+        if line >= 0:
+            start, end = line_offsets[line], line_offsets[line + 1]
+            sorted_targets.extend(targets[start:end])
+            sorted_costs.extend(costs[start:end])
+            described[new_id] = 1
+        offsets.append(len(sorted_targets))
+
+    return StateGraph(
+        [names[x] for x in order],
+        offsets,
+        sorted_targets,
+        sorted_costs,
+        rank[initial_state],
+        set(rank[x] for x in goal_states),
+        described,
+    )
+
+
+class CompiledNames:
+    def __init__(self, name_offsets, blob):
+        self.__name_offsets = name_offsets
+        self.__blob = blob
+        self.__size = len(name_offsets) - 1
+
+    def __len__(self):
+        return self.__size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.__size
+        if not 0 <= index < self.__size:
+            raise IndexError(index)
+        start, end = self.__name_offsets[index], self.__name_offsets[index + 1]
+        return str(self.__blob[start:end], "utf-8")
+
+
+def source_signature(path: str):
+    if path is None or not os.path.isfile(path):
+        return 0, bytes(32)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return os.stat(path).st_mtime_ns, digest.digest()
+
+
+def same_file(path: str, other: str) -> bool:
+    # a recorded source that was moved or deleted simply does not match
+    try:
+        return os.path.samefile(path, other)
+    except OSError:
+        return False
+
+
+def is_compiled_graph(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(COMPILED_MAGIC)) == COMPILED_MAGIC
+
+
+def compile_state_graph(
+    compiled_path: str,
+    graph: StateGraph,
+    ss_path: str,
+    heuristic: array = None,
+    heuristic_path: str = None,
+):
+    encoded_names = [name.encode("utf-8") for name in graph.names]
+    name_offsets = array("q", [0])
+    for name in encoded_names:
+        name_offsets.append(name_offsets[-1] + len(name))
+    goal_states = array("i", sorted(graph.goal_states))
+    paths = [
+        os.path.abspath(x).encode("utf-8") if x else b""
+        for x in (ss_path, heuristic_path)
+    ]
+
+    header = COMPILED_HEADER.pack(
+        COMPILED_MAGIC,
+        COMPILED_VERSION,
+        heuristic is not None,
+        len(graph),
+        len(graph.targets),
+        len(goal_states),
+        graph.initial_state,
+        name_offsets[-1],
+        *source_signature(ss_path),
+        *source_signature(heuristic_path),
+        *(len(x) for x in paths),
+    )
+    sections = [header + b"".join(paths), name_offsets, b"".join(encoded_names)]
+    sections += [graph.offsets, graph.targets, graph.costs, graph.described]
+    sections.append(goal_states)
+    if heuristic is not None:
+        sections.append(heuristic)
+
+    temporary_path = f"{compiled_path}.tmp"
+    with open(temporary_path, "wb") as f:
+        for section in sections:
+            size = f.write(section)
+            f.write(bytes(-size % 8))
+    os.replace(temporary_path, compiled_path)
+
+
+def load_compiled_graph(compiled_path: str):
+    with open(compiled_path, "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(m) < COMPILED_HEADER.size:
+        raise ValueError(f"incompatible compiled descriptor {compiled_path}")
+    (
+        magic,
+        version,
+        has_heuristic,
+        num_states,
+        num_edges,
+        num_goals,
+        initial_state,
+        names_size,
+        ss_mtime,
+        ss_digest,
+        heuristic_mtime,
+        heuristic_digest,
+        ss_path_size,
+        heuristic_path_size,
+    ) = COMPILED_HEADER.unpack_from(m)
+    if magic != COMPILED_MAGIC or version != COMPILED_VERSION:
+        raise ValueError(f"incompatible compiled descriptor {compiled_path}")
+
+    position = COMPILED_HEADER.size
+    ss_path = bytes(m[position : position + ss_path_size]).decode("utf-8")
+    position += ss_path_size
+    heuristic_path = bytes(m[position : position + heuristic_path_size])
+    heuristic_path = heuristic_path.decode("utf-8") or None
+    position += heuristic_path_size
+
+    fresh = all(
+        not os.path.isfile(path) or source_signature(path) == signature
+        for path, signature in (
+            (ss_path, (ss_mtime, ss_digest)),
+            (heuristic_path, (heuristic_mtime, heuristic_digest)),
+        )
+        if path
+    )
+    if not fresh:
+        return None, None, ss_path, heuristic_path
+
+    view = memoryview(m)
+
+    def section(fmt, size, count):
+        nonlocal position
+        position += -position % 8
+        data = view[position : position + size * count]
+        position += size * count
+        return data.cast(fmt) if fmt else data
+
+    name_offsets = section("q", 8, num_states + 1)
+    names = CompiledNames(name_offsets, section(None, 1, names_size))
+    offsets = section("q", 8, num_states + 1)
+    targets = section("i", 4, num_edges)
+    costs = section("d", 8, num_edges)
+    described = section("b", 1, num_states)
+    goal_states = set(section("i", 4, num_goals))
+    heuristic = section("d", 8, num_states) if has_heuristic else None
+
+    graph = StateGraph(
+        names, offsets, targets, costs, initial_state, goal_states, described
+    )
+    return graph, heuristic, ss_path, heuristic_path
+
+
+def load_state_graph(
+    ss_path: str,
+    heuristic_path: str = None,
+    compiled_path: str = None,
+    use_mmap: bool = False,
+):
+    if is_compiled_graph(ss_path):
+        compiled_path, ss_path = ss_path, None
+    if compiled_path and os.path.isfile(compiled_path):
+        try:
+            (
+                graph,
+                heuristic,
+                compiled_ss_path,
+                compiled_heuristic_path,
+            ) = load_compiled_graph(compiled_path)
+        except ValueError:
+            if ss_path is None:
+                raise
+            graph, compiled_ss_path, compiled_heuristic_path = None, ss_path, None
+        if ss_path is None:
+            ss_path = compiled_ss_path
+        elif not same_file(ss_path, compiled_ss_path):
+            graph = None
+        if graph is not None:
+            if heuristic_path is None:
+                if heuristic is None:
+                    return graph, None, None
+                return graph, heuristic, compiled_heuristic_path
+            if compiled_heuristic_path is not None and same_file(
+                heuristic_path, compiled_heuristic_path
+            ):
+                return graph, heuristic, heuristic_path
+            heuristic = generate_heuristic_array(heuristic_path, graph, use_mmap)
+            return graph, heuristic, heuristic_path
+        # only a stale build of the same source keeps its recorded heuristic, a
+        # different source gets a cache without one
+        if (
+            heuristic_path is None
+            and compiled_heuristic_path is not None
+            and same_file(ss_path, compiled_ss_path)
+            and os.path.isfile(compiled_heuristic_path)
+        ):
+            heuristic_path = compiled_heuristic_path
+
+    if not os.path.isfile(ss_path):
+        raise FileNotFoundError(f"missing source of compiled descriptor {ss_path}")
+    graph = generate_state_graph(ss_path, use_mmap)
+    heuristic = (
+        generate_heuristic_array(heuristic_path, graph, use_mmap)
+        if heuristic_path
+        else None
+    )
+    if compiled_path:
+        compile_state_graph(compiled_path, graph, ss_path, heuristic, heuristic_path)
+    return graph, heuristic, heuristic_path
+
+
+class SearchStats:
+    def __init__(self):
+        self.parse_time = 0.0
+        self.search_time = 0.0
+        self.nodes_expanded = 0
+        self.nodes_generated = 0
+        self.peak_open = 0
+        self.peak_memory = None
+        self.reopenings = 0
+
+    def record(self, nodes_expanded, nodes_generated, peak_open, reopenings=0):
+        self.nodes_expanded = nodes_expanded
+        self.nodes_generated = nodes_generated
+        self.peak_open = peak_open
+        self.reopenings = reopenings
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
 
 
 def backtrace(initial_state, goal_state, parent_dict):
@@ -100,17 +473,20 @@ def backtrace(initial_state, goal_state, parent_dict):
     return list(reversed(path)), cost
 
 
-def bfs(initial_state: str, goal_states: set, state_dict: dict, *_):
+def bfs(initial_state: str, goal_states: set, state_dict: dict, *_, stats=None):
     open_queue = deque([initial_state])
     parent_dict = dict()
     visited = set()
+    num_expanded = num_generated = peak_open = 0
 
     while open_queue:
         current_state = open_queue.popleft()
         visited.add(current_state)
         children = state_dict[current_state]
+        num_expanded += 1
 
         for child_name, child_cost in children:
+            num_generated += 1
             if child_name not in visited:
                 parent_dict[child_name] = (current_state, child_cost)
                 visited.add(child_name)
@@ -120,15 +496,19 @@ def bfs(initial_state: str, goal_states: set, state_dict: dict, *_):
                 path, cost = backtrace(initial_state, child_name, parent_dict)
                 if measure_time:
                     print(f"Time elapsed: {time.time() - start}")
+                if stats is not None:
+                    stats.record(num_expanded, num_generated, peak_open)
                 return cost, path, len(path), len(visited)
+        peak_open = max(peak_open, len(open_queue))
     exit(1)
 
 
-def ucs(initial_state: str, goal_states: set, state_dict: dict, *_):
+def ucs(initial_state: str, goal_states: set, state_dict: dict, *_, stats=None):
     open_list = [(0, initial_state)]
     parent_dict = dict()
     total_cost_dict = dict()
     visited = set()
+    num_expanded = num_generated = peak_open = 0
 
     while open_list:
         current_state_cost, current_state_name = heapq.heappop(open_list)
@@ -138,9 +518,13 @@ def ucs(initial_state: str, goal_states: set, state_dict: dict, *_):
             path, cost = backtrace(initial_state, current_state_name, parent_dict)
             if measure_time:
                 print(f"Time elapsed: {time.time() - start}")
+            if stats is not None:
+                stats.record(num_expanded, num_generated, peak_open)
             return cost, path, len(path), len(visited)
 
         children = state_dict[current_state_name]
+        num_expanded += 1
+        num_generated += len(children)
 
         for child_name, child_cost in children:
             if (
@@ -150,24 +534,259 @@ def ucs(initial_state: str, goal_states: set, state_dict: dict, *_):
                 parent_dict[child_name] = (current_state_name, child_cost)
                 total_cost_dict[child_name] = child_cost + current_state_cost
                 heapq.heappush(open_list, (child_cost + current_state_cost, child_name))
+        peak_open = max(peak_open, len(open_list))
     exit(1)
 
 
-def generate_heuristic_dict(heuristic_path: str):
-    with open(heuristic_path, encoding="utf-8") as f:
-        return {
-            k: float(v)
-            for k, v in [x.split(": ") for x in f.readlines() if x[0] != "#"]
-        }
+def bfs_graph(initial_state: int, goal_states: set, graph: StateGraph, *_, stats=None):
+    targets, costs = graph.targets, graph.costs
+    open_queue = deque([initial_state])
+    parent_dict = dict()
+    visited = set()
+    num_expanded = num_generated = peak_open = 0
+
+    while open_queue:
+        current_state = open_queue.popleft()
+        visited.add(current_state)
+        children = sorted(graph.edges(current_state), key=targets.__getitem__)
+        num_expanded += 1
+
+        for edge in children:
+            num_generated += 1
+            child = targets[edge]
+            if child not in visited:
+                parent_dict[child] = (current_state, costs[edge])
+                visited.add(child)
+                open_queue.append(child)
+
+            if child in goal_states:
+                path, cost = backtrace(initial_state, child, parent_dict)
+                if measure_time:
+                    print(f"Time elapsed: {time.time() - start}")
+                if stats is not None:
+                    stats.record(num_expanded, num_generated, peak_open)
+                return cost, [graph.names[x] for x in path], len(path), len(visited)
+        peak_open = max(peak_open, len(open_queue))
+    if stats is not None:
+        stats.record(num_expanded, num_generated, peak_open)
+    return None
+
 
+class HeapQueue:
+    def __init__(self):
+        self.__heap = list()
+        self.__priorities = dict()
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+
+    def __len__(self):
+        return len(self.__priorities)
+
+    def push(self, priority, item):
+        if priority < self.__priorities.get(item, inf):
+            self.__priorities[item] = priority
+            heapq.heappush(self.__heap, (priority, item))
+            self.pushes += 1
+
+    def pop(self):
+        while True:
+            priority, item = heapq.heappop(self.__heap)
+            if self.__priorities.get(item) == priority:
+                del self.__priorities[item]
+                self.pops += 1
+                return priority, item
+            self.stale_pops += 1
+
+
+class IndexedHeapQueue:
+    def __init__(self):
+        self.__heap = list()
+        self.__positions = dict()
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def push(self, priority, item):
+        position = self.__positions.get(item)
+        if position is None:
+            self.__heap.append((priority, item))
+            position = len(self.__heap) - 1
+        elif priority < self.__heap[position][0]:
+            self.__heap[position] = (priority, item)
+        else:
+            return
+        self.pushes += 1
+        self.__sift_up(position)
 
-def astar(initial_state: str, goal_states: set, state_dict: dict, heuristic_path: str):
-    heuristic_dict = generate_heuristic_dict(heuristic_path)
+    def pop(self):
+        heap = self.__heap
+        top = heap[0]
+        last = heap.pop()
+        del self.__positions[top[1]]
+        if heap:
+            heap[0] = last
+            self.__sift_down(0)
+        self.pops += 1
+        return top
+
+    def __sift_up(self, position):
+        heap, positions = self.__heap, self.__positions
+        entry = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if heap[parent] <= entry:
+                break
+            heap[position] = heap[parent]
+            positions[heap[position][1]] = position
+            position = parent
+        heap[position] = entry
+        positions[entry[1]] = position
+
+    def __sift_down(self, position):
+        heap, positions = self.__heap, self.__positions
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= len(heap):
+                break
+            if child + 1 < len(heap) and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[position] = heap[child]
+            positions[heap[position][1]] = position
+            position = child
+        heap[position] = entry
+        positions[entry[1]] = position
+
+
+class BucketQueue:
+    # Dial's bucket queue for integral priorities. Under ucs the live buckets
+    # span at most the largest edge cost, so finding the next non-empty one
+    # stays cheap.
+    def __init__(self):
+        self.__buckets = dict()
+        self.__base = None
+        self.__priorities = dict()
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+
+    def __len__(self):
+        return len(self.__priorities)
+
+    def push(self, priority, item):
+        if priority >= self.__priorities.get(item, inf):
+            return
+        bucket = int(priority)
+        if bucket != priority:
+            raise ValueError(f"bucket queue needs integer priorities, got {priority}")
+        if self.__base is not None and bucket < self.__base:
+            self.__base = bucket
+        if bucket not in self.__buckets:
+            self.__buckets[bucket] = list()
+        heapq.heappush(self.__buckets[bucket], item)
+        self.__priorities[item] = priority
+        self.pushes += 1
+
+    def pop(self):
+        while True:
+            if self.__buckets.get(self.__base) is None:
+                self.__base = min(self.__buckets)
+            bucket = self.__buckets[self.__base]
+            item = heapq.heappop(bucket)
+            if not bucket:
+                del self.__buckets[self.__base]
+            priority = self.__priorities.get(item)
+            if priority is not None and int(priority) == self.__base:
+                del self.__priorities[item]
+                self.pops += 1
+                return priority, item
+            self.stale_pops += 1
+
+
+queue_dict = {
+    "heapq": HeapQueue,
+    "indexed": IndexedHeapQueue,
+    "bucket": BucketQueue,
+}
+
+
+def ucs_graph(
+    initial_state: int,
+    goal_states: set,
+    graph: StateGraph,
+    *_,
+    open_list=None,
+    stats=None,
+):
+    offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+    if open_list is None:
+        open_list = HeapQueue()
+    open_list.push(0, initial_state)
+    parent_dict = dict()
+    total_cost_dict = dict()
+    visited = set()
+    num_expanded = num_generated = peak_open = 0
+
+    while open_list:
+        current_state_cost, current_state = open_list.pop()
+        visited.add(current_state)
+
+        if current_state in goal_states:
+            path, cost = backtrace(initial_state, current_state, parent_dict)
+            if measure_time:
+                print(f"Time elapsed: {time.time() - start}")
+            if stats is not None:
+                stats.record(num_expanded, num_generated, peak_open)
+            return cost, [graph.names[x] for x in path], len(path), len(visited)
+
+        num_expanded += 1
+        num_generated += offsets[current_state + 1] - offsets[current_state]
+        for edge in range(offsets[current_state], offsets[current_state + 1]):
+            child, child_cost = targets[edge], costs[edge]
+            if (
+                child not in parent_dict
+                or total_cost_dict[child] > current_state_cost + child_cost
+            ) and child not in visited:
+                parent_dict[child] = (current_state, child_cost)
+                total_cost_dict[child] = child_cost + current_state_cost
+                open_list.push(child_cost + current_state_cost, child)
+        peak_open = max(peak_open, len(open_list))
+    if stats is not None:
+        stats.record(num_expanded, num_generated, peak_open)
+    return None
+
+
+def generate_heuristic_dict(heuristic_path: str, use_mmap: bool = False):
+    return {
+        state: float(value)
+        for state, _, value in (
+            x.partition(": ") for x in read_descriptor_lines(heuristic_path, use_mmap)
+        )
+    }
+
+
+def astar(
+    initial_state: str,
+    goal_states: set,
+    state_dict: dict,
+    heuristic_path: str,
+    stats=None,
+    heuristic_dict: dict = None,
+):
+    if heuristic_dict is None:
+        heuristic_dict = generate_heuristic_dict(heuristic_path)
 
     open_list = [(0 + heuristic_dict[initial_state], initial_state)]
     parent_dict = dict()
     total_cost_dict = {initial_state: 0}
     visited = set()
+    num_expanded = num_generated = peak_open = num_reopened = 0
 
     while open_list:
         current_state_cost, current_state_name = heapq.heappop(open_list)
@@ -177,42 +796,528 @@ def astar(initial_state: str, goal_states: set, state_dict: dict, heuristic_path
             path, cost = backtrace(initial_state, current_state_name, parent_dict)
             if measure_time:
                 print(f"Time elapsed: {time.time() - start}")
+            if stats is not None:
+                stats.record(num_expanded, num_generated, peak_open, num_reopened)
             return cost, path, len(path), len(visited)
 
         children = state_dict[current_state_name]
+        current_g = total_cost_dict[current_state_name]
+        current_f = current_g + heuristic_dict[current_state_name]
+        num_expanded += 1
+        num_generated += len(children)
 
         for child_name, child_cost in children:
             if child_name not in visited:
-                g = total_cost_dict[current_state_name] + child_cost
+                g = current_g + child_cost
                 h = heuristic_dict[child_name]
-                f = max(
-                    total_cost_dict[current_state_name]
-                    + heuristic_dict[current_state_name],
-                    g + h,
-                )
+                f = max(current_f, g + h)
 
                 if child_name not in total_cost_dict or g < total_cost_dict[child_name]:
+                    if child_name in total_cost_dict:
+                        num_reopened += 1
                     total_cost_dict[child_name] = g
                     parent_dict[child_name] = (current_state_name, child_cost)
                     heapq.heappush(open_list, (f, child_name))
+        peak_open = max(peak_open, len(open_list))
     exit(1)
 
 
-def check_optimistic(goal_states, state_dict, heuristic_path):
-    heuristic_dict = generate_heuristic_dict(heuristic_path)
+def generate_heuristic_array(
+    heuristic_path: str, graph: StateGraph, use_mmap: bool = False
+):
+    heuristic = array("d", bytes(8 * len(graph)))
+    ids = {name: state for state, name in enumerate(graph.names)}
+    for line in read_descriptor_lines(heuristic_path, use_mmap):
+        name, _, value = line.partition(": ")
+        # heuristic entries for states missing from the graph are never looked up
+        state = ids.get(name)
+        if state is not None:
+            heuristic[state] = float(value)
+    return heuristic
+
+
+def astar_graph(
+    initial_state: int,
+    goal_states: set,
+    graph: StateGraph,
+    heuristic: array,
+    open_list=None,
+    stats=None,
+):
+    offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+    if open_list is None:
+        open_list = HeapQueue()
+    open_list.push(0 + heuristic[initial_state], initial_state)
+    parent_dict = dict()
+    total_cost_dict = {initial_state: 0}
+    visited = set()
+    num_expanded = num_generated = peak_open = num_reopened = 0
+
+    while open_list:
+        _, current_state = open_list.pop()
+        visited.add(current_state)
+
+        if current_state in goal_states:
+            path, cost = backtrace(initial_state, current_state, parent_dict)
+            if measure_time:
+                print(f"Time elapsed: {time.time() - start}")
+            if stats is not None:
+                stats.record(num_expanded, num_generated, peak_open, num_reopened)
+            return cost, [graph.names[x] for x in path], len(path), len(visited)
+
+        current_g = total_cost_dict[current_state]
+        current_f = current_g + heuristic[current_state]
+        num_expanded += 1
+        num_generated += offsets[current_state + 1] - offsets[current_state]
+
+        for edge in range(offsets[current_state], offsets[current_state + 1]):
+            child = targets[edge]
+            if child not in visited:
+                g = current_g + costs[edge]
+                f = max(current_f, g + heuristic[child])
+
+                if child not in total_cost_dict or g < total_cost_dict[child]:
+                    if child in total_cost_dict:
+                        num_reopened += 1
+                    total_cost_dict[child] = g
+                    parent_dict[child] = (current_state, costs[edge])
+                    open_list.push(f, child)
+        peak_open = max(peak_open, len(open_list))
+    if stats is not None:
+        stats.record(num_expanded, num_generated, peak_open, num_reopened)
+    return None
+
+
+def join_paths(graph: StateGraph, meeting_state: int, forward_dict, backward_dict):
+    path = [meeting_state]
+    while forward_dict[path[0]] is not None:
+        path.insert(0, forward_dict[path[0]][0])
+    costs = list()
+    for state in path[1:]:
+        costs.append(forward_dict[state][1])
+    while backward_dict[path[-1]] is not None:
+        next_state, next_cost = backward_dict[path[-1]]
+        path.append(next_state)
+        costs.append(next_cost)
+
+    cost = 0.0
+    for edge_cost in reversed(costs):
+        cost += edge_cost
+    return cost, [graph.names[x] for x in path]
+
+
+def bibfs_graph(
+    initial_state: int, goal_states: set, graph: StateGraph, *_, stats=None
+):
+    reverse_graph = graph.reverse()
+    forward_dict = {initial_state: None}
+    backward_dict = {goal_state: None for goal_state in goal_states}
+    forward_level = [initial_state]
+    backward_level = sorted(goal_states)
+    meeting_state = initial_state if initial_state in goal_states else None
+    num_expanded = num_generated = 0
+    peak_open = len(forward_level) + len(backward_level)
+
+    while meeting_state is None and forward_level and backward_level:
+        if len(forward_level) <= len(backward_level):
+            expanded, other_dict, level = graph, backward_dict, forward_level
+            visited_dict = forward_dict
+        else:
+            expanded, other_dict, level = reverse_graph, forward_dict, backward_level
+            visited_dict = backward_dict
+
+        next_level = list()
+        best_length = inf
+        for current_state in level:
+            children = sorted(
+                expanded.edges(current_state), key=expanded.targets.__getitem__
+            )
+            num_expanded += 1
+            num_generated += len(children)
+            for edge in children:
+                child = expanded.targets[edge]
+                if child in visited_dict:
+                    continue
+                visited_dict[child] = (current_state, expanded.costs[edge])
+                next_level.append(child)
+                if child in other_dict:
+                    length = path_length(child, forward_dict) + path_length(
+                        child, backward_dict
+                    )
+                    if length < best_length:
+                        meeting_state, best_length = child, length
+
+        if expanded is graph:
+            forward_level = next_level
+        else:
+            backward_level = next_level
+        peak_open = max(peak_open, len(forward_level) + len(backward_level))
+
+    if stats is not None:
+        stats.record(num_expanded, num_generated, peak_open)
+    if meeting_state is None:
+        return None
+    cost, path = join_paths(graph, meeting_state, forward_dict, backward_dict)
+    if measure_time:
+        print(f"Time elapsed: {time.time() - start}")
+    return cost, path, len(path), len(forward_dict.keys() | backward_dict.keys())
+
+
+def path_length(state: int, parent_dict: dict):
+    length = 0
+    while parent_dict[state] is not None:
+        state = parent_dict[state][0]
+        length += 1
+    return length
+
+
+def biucs_graph(
+    initial_state: int, goal_states: set, graph: StateGraph, *_, stats=None
+):
+    searches = list()
+    for expanded, sources in (
+        (graph, [initial_state]),
+        (graph.reverse(), sorted(goal_states)),
+    ):
+        searches.append(
+            (
+                expanded,
+                [(0.0, x) for x in sources],
+                {x: 0.0 for x in sources},
+                {x: None for x in sources},
+                set(),
+            )
+        )
+    _, forward_open, _, forward_dict, forward_visited = searches[0]
+    _, backward_open, _, backward_dict, backward_visited = searches[1]
+
+    best_cost, meeting_state = inf, None
+    if initial_state in goal_states:
+        best_cost, meeting_state = 0.0, initial_state
+    num_expanded = num_generated = num_reopened = 0
+    peak_open = len(forward_open) + len(backward_open)
+
+    # a path through the meeting state is optimal once no pair of frontier
+    # states can be joined into anything cheaper
+    while forward_open and backward_open:
+        if forward_open[0][0] + backward_open[0][0] >= best_cost:
+            break
+        side = 0 if forward_open[0][0] <= backward_open[0][0] else 1
+        expanded, open_list, cost_dict, parent_dict, visited = searches[side]
+        other_cost = searches[1 - side][2]
+
+        current_state_cost, current_state = heapq.heappop(open_list)
+        if current_state in visited:
+            continue
+        visited.add(current_state)
+        num_expanded += 1
+
+        for edge in expanded.edges(current_state):
+            child = expanded.targets[edge]
+            child_cost = current_state_cost + expanded.costs[edge]
+            num_generated += 1
+            if child_cost < cost_dict.get(child, inf):
+                if child in cost_dict:
+                    num_reopened += 1
+                cost_dict[child] = child_cost
+                parent_dict[child] = (current_state, expanded.costs[edge])
+                heapq.heappush(open_list, (child_cost, child))
+                if child in other_cost and child_cost + other_cost[child] < best_cost:
+                    best_cost = child_cost + other_cost[child]
+                    meeting_state = child
+        peak_open = max(peak_open, len(forward_open) + len(backward_open))
+
+    if stats is not None:
+        stats.record(num_expanded, num_generated, peak_open, num_reopened)
+    if meeting_state is None:
+        return None
+    cost, path = join_paths(graph, meeting_state, forward_dict, backward_dict)
+    if measure_time:
+        print(f"Time elapsed: {time.time() - start}")
+    return cost, path, len(path), len(forward_visited | backward_visited)
+
+
+def idastar_graph(
+    initial_state: int,
+    goal_states: set,
+    graph: StateGraph,
+    heuristic: array,
+    stats=None,
+):
+    offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+    threshold = heuristic[initial_state]
+    num_expanded = num_generated = peak_open = 0
+
+    while True:
+        next_threshold = inf
+        path = [initial_state]
+        path_costs = [0.0]
+        total_costs = [0.0]
+        on_path = {initial_state}
+        stack = [iter(range(offsets[initial_state], offsets[initial_state + 1]))]
+        found = initial_state in goal_states
+        if not found:
+            num_expanded += 1
+
+        while stack and not found:
+            edge = next(stack[-1], None)
+            if edge is None:
+                stack.pop()
+                on_path.remove(path.pop())
+                path_costs.pop()
+                total_costs.pop()
+                continue
+
+            child = targets[edge]
+            num_generated += 1
+            if child in on_path:
+                continue
+            g = total_costs[-1] + costs[edge]
+            f = g + heuristic[child]
+            if f > threshold:
+                next_threshold = min(next_threshold, f)
+                continue
+
+            path.append(child)
+            path_costs.append(costs[edge])
+            total_costs.append(g)
+            on_path.add(child)
+            if child in goal_states:
+                found = True
+            else:
+                num_expanded += 1
+                stack.append(iter(range(offsets[child], offsets[child + 1])))
+                peak_open = max(peak_open, len(stack))
+
+        if stats is not None and (found or next_threshold == inf):
+            stats.record(num_expanded, num_generated, max(peak_open, 1))
+        if found:
+            parent_dict = {
+                state: (parent, cost)
+                for parent, state, cost in zip(path, path[1:], path_costs[1:])
+            }
+            path, cost = backtrace(initial_state, path[-1], parent_dict)
+            if measure_time:
+                print(f"Time elapsed: {time.time() - start}")
+            return cost, [graph.names[x] for x in path], len(path), num_expanded
+        if next_threshold == inf:
+            return None
+        threshold = next_threshold
+
+
+class SMANode:
+    def __init__(self, state, parent, g, f, depth, edge_cost):
+        self.state = state
+        self.parent = parent
+        self.g = g
+        self.f = f
+        self.depth = depth
+        self.edge_cost = edge_cost
+        self.children = dict()
+        self.forgotten = dict()
+        self.expanded = False
+        self.in_memory = True
+        self.version = 0
+
+
+def smastar_graph(
+    initial_state: int,
+    goal_states: set,
+    graph: StateGraph,
+    heuristic: array,
+    mem_limit: int = None,
+    stats=None,
+):
+    # the limit is enforced after every expansion, so memory briefly holds up
+    # to one expansion's worth of successors above it; below two nodes the
+    # root could never keep a child, so smaller limits are raised to that
+    if mem_limit is not None:
+        mem_limit = max(mem_limit, 2)
+    max_depth = inf if mem_limit is None else mem_limit - 1
+    offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+    serial = count()
+    open_list = list()
+    leaf_list = list()
+
+    def enqueue(node):
+        node.version += 1
+        if not node.expanded:
+            key = node.f
+        elif node.forgotten:
+            key = min(node.forgotten.values())
+        else:
+            key = None
+        if key is not None:
+            heapq.heappush(
+                open_list, (key, -node.depth, next(serial), node.version, node)
+            )
+        if not node.children and node.parent is not None:
+            heapq.heappush(
+                leaf_list, (-node.f, node.depth, next(serial), node.version, node)
+            )
+
+    def pop_valid(heap):
+        while heap:
+            *_, version, node = heapq.heappop(heap)
+            if node.in_memory and version == node.version:
+                return node
+        return None
+
+    root = SMANode(initial_state, None, 0.0, heuristic[initial_state], 0, 0.0)
+    enqueue(root)
+    in_memory = peak_memory = 1
+    num_expanded = num_generated = 0
+
+    while True:
+        best = pop_valid(open_list)
+        if best is None or best.f == inf:
+            if stats is not None:
+                stats.record(num_expanded, num_generated, peak_memory)
+            return None
+
+        if best.state in goal_states:
+            parent_dict = dict()
+            node = best
+            while node.parent is not None:
+                parent_dict[node.state] = (node.parent.state, node.edge_cost)
+                node = node.parent
+            path, cost = backtrace(initial_state, best.state, parent_dict)
+            if measure_time:
+                print(f"Time elapsed: {time.time() - start}")
+            if stats is not None:
+                stats.record(num_expanded, num_generated, peak_memory)
+            return cost, [graph.names[x] for x in path], len(path), num_expanded
+
+        num_expanded += 1
+        on_path = set()
+        node = best
+        while node is not None:
+            on_path.add(node.state)
+            node = node.parent
+
+        successors = dict()
+        for edge in range(offsets[best.state], offsets[best.state + 1]):
+            child_state = targets[edge]
+            if child_state in on_path or child_state in best.children:
+                continue
+            if costs[edge] < successors.get(child_state, inf):
+                successors[child_state] = costs[edge]
+
+        for child_state, child_cost in successors.items():
+            g = best.g + child_cost
+            if child_state not in goal_states and best.depth + 1 >= max_depth:
+                f = inf
+            else:
+                f = max(best.f, g + heuristic[child_state])
+            f = max(f, best.forgotten.pop(child_state, f))
+            child = SMANode(child_state, best, g, f, best.depth + 1, child_cost)
+            best.children[child_state] = child
+            in_memory += 1
+            num_generated += 1
+            enqueue(child)
+        peak_memory = max(peak_memory, in_memory)
+        best.forgotten.clear()
+        best.expanded = True
+
+        node = best
+        while node is not None:
+            values = [x.f for x in node.children.values()]
+            values.extend(node.forgotten.values())
+            f = min(values) if values else inf
+            if node is not best and f == node.f:
+                break
+            node.f = f
+            enqueue(node)
+            node = node.parent
+
+        while mem_limit is not None and in_memory > mem_limit:
+            worst = pop_valid(leaf_list)
+            if worst is None:
+                break
+            parent = worst.parent
+            parent.forgotten[worst.state] = worst.f
+            del parent.children[worst.state]
+            worst.in_memory = False
+            in_memory -= 1
+            enqueue(parent)
+
+
+def reverse_state_graph(graph: StateGraph):
+    offsets = array("q", bytes(8 * (len(graph) + 1)))
+    for target in graph.targets:
+        offsets[target + 1] += 1
+    for state in range(len(graph)):
+        offsets[state + 1] += offsets[state]
+
+    position = offsets[:-1]
+    targets = array("i", bytes(4 * len(graph.targets)))
+    costs = array("d", bytes(8 * len(graph.costs)))
+    for state in range(len(graph)):
+        for edge in graph.edges(state):
+            slot = position[graph.targets[edge]]
+            targets[slot] = state
+            costs[slot] = graph.costs[edge]
+            position[graph.targets[edge]] += 1
+
+    return StateGraph(
+        graph.names,
+        offsets,
+        targets,
+        costs,
+        graph.initial_state,
+        graph.goal_states,
+        graph.described,
+    )
+
+
+def compute_h_star(graph: StateGraph):
+    reverse_graph = graph.reverse()
+    offsets, targets, costs = (
+        reverse_graph.offsets,
+        reverse_graph.targets,
+        reverse_graph.costs,
+    )
+    h_star = array("d", [inf]) * len(graph)
+    open_list = [(0.0, goal_state) for goal_state in sorted(graph.goal_states)]
+    for _, goal_state in open_list:
+        h_star[goal_state] = 0.0
+
+    while open_list:
+        current_state_cost, current_state = heapq.heappop(open_list)
+        if current_state_cost > h_star[current_state]:
+            continue
+        for edge in range(offsets[current_state], offsets[current_state + 1]):
+            parent, parent_cost = targets[edge], current_state_cost + costs[edge]
+            if parent_cost < h_star[parent]:
+                h_star[parent] = parent_cost
+                heapq.heappush(open_list, (parent_cost, parent))
+    return h_star
+
+
+def descriptor_order(graph: StateGraph):
+    # the order of the sorted "state: successors" lines of the descriptor
+    return sorted(
+        (x for x in range(len(graph)) if graph.described[x]),
+        key=lambda x: graph.names[x] + ": ",
+    )
+
+
+def check_optimistic(graph: StateGraph, heuristic: array, heuristic_path: str):
+    h_star = compute_h_star(graph)
     print(f"# HEURISTIC-OPTIMISTIC {heuristic_path}")
     optimistic = True
 
-    for state in state_dict:
-        real_cost, *_ = ucs(state, goal_states, state_dict)
-        heuristic_cost = heuristic_dict[state]
+    for state in descriptor_order(graph):
+        state_name = graph.names[state]
+        real_cost = h_star[state]
+        heuristic_cost = heuristic[state]
         if heuristic_cost <= real_cost:
             print(
-                f"[CONDITION]: [OK] h({state}) <= h*: {heuristic_cost} <= {real_cost}"
+                f"[CONDITION]: [OK] h({state_name}) <= h*: {heuristic_cost} <= {real_cost}"
             )
         else:
             print(
-                f"[CONDITION]: [ERR] h({state}) <= h*: {heuristic_cost} <= {real_cost}"
+                f"[CONDITION]: [ERR] h({state_name}) <= h*: {heuristic_cost} <= {real_cost}"
             )
             optimistic = False
 
@@ -222,55 +1327,351 @@ def check_optimistic(goal_states, state_dict, heuristic_path):
         print("[CONCLUSION]: Heuristic is not optimistic.")
 
 
-def check_consistent(state_dict, heuristic_path):
-    heuristic_dict = generate_heuristic_dict(heuristic_path)
+def inconsistent_edges(graph: StateGraph, heuristic, start: int = 0, end: int = None):
+    if end is None:
+        end = len(graph)
+    if np is not None:
+        offsets = np.frombuffer(graph.offsets, dtype=np.int64)[start : end + 1]
+        targets = np.frombuffer(graph.targets, dtype=np.int32)[offsets[0] : offsets[-1]]
+        costs = np.frombuffer(graph.costs, dtype=np.float64)[offsets[0] : offsets[-1]]
+        h = np.frombuffer(heuristic, dtype=np.float64)
+        edges = np.arange(offsets[0], offsets[-1])
+        sources = np.repeat(np.arange(start, end), np.diff(offsets))
+        inconsistent = h[sources] > costs + h[targets]
+        return list(zip(sources[inconsistent].tolist(), edges[inconsistent].tolist()))
+
+    violations = list()
+    for state in range(start, end):
+        for edge in graph.edges(state):
+            if heuristic[state] > graph.costs[edge] + heuristic[graph.targets[edge]]:
+                violations.append((state, edge))
+    return violations
+
+
+def inconsistent_edges_chunk(bounds):
+    graph, heuristic = consistency_check_data
+    return inconsistent_edges(graph, heuristic, *bounds)
+
+
+def find_inconsistent_edges(graph: StateGraph, heuristic, workers: int = 1):
+    global consistency_check_data
+    num_states = len(graph)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return inconsistent_edges(graph, heuristic)
+
+    # forked workers inherit the graph instead of receiving a pickled copy
+    consistency_check_data = (graph, heuristic)
+    chunk_size = max(1, -(-num_states // workers))
+    bounds = [
+        (start, min(start + chunk_size, num_states))
+        for start in range(0, num_states, chunk_size)
+    ]
+    try:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            chunks = pool.map(inconsistent_edges_chunk, bounds)
+    finally:
+        consistency_check_data = None
+    return [violation for chunk in chunks for violation in chunk]
+
+
+def check_consistent(
+    graph: StateGraph,
+    heuristic,
+    heuristic_path: str,
+    violations_only: bool = False,
+    workers: int = 1,
+):
+    if violations_only:
+        violations = find_inconsistent_edges(graph, heuristic, workers)
+        checked = sorted(violations, key=lambda x: (graph.names[x[0]] + ": ", x[1]))
+    else:
+        checked = (
+            (state, edge)
+            for state in descriptor_order(graph)
+            for edge in graph.edges(state)
+        )
     print(f"# HEURISTIC-CONSISTENT {heuristic_path}")
+    names, targets, costs = graph.names, graph.targets, graph.costs
     consistent = True
-    for state, children in state_dict.items():
-        for child_name, child_cost in children:
-            heuristic_cost_parent = heuristic_dict[state]
-            heuristic_cost_child = heuristic_dict[child_name]
-            if heuristic_cost_parent <= child_cost + heuristic_cost_child:
-                print(
-                    f"[CONDITION]: [OK] h({state}) <= h({child_name}) + c: {heuristic_cost_parent} <= {heuristic_cost_child} + {child_cost}"
-                )
-            else:
-                print(
-                    f"[CONDITION]: [ERR] h({state}) <= h({child_name}) + c: {heuristic_cost_parent} <= {heuristic_cost_child} + {child_cost}"
-                )
-                consistent = False
 
+    for state, edge in checked:
+        child = targets[edge]
+        state_name, child_name = names[state], names[child]
+        heuristic_cost_parent = heuristic[state]
+        heuristic_cost_child = heuristic[child]
+        child_cost = costs[edge]
+        if heuristic_cost_parent <= heuristic_cost_child + child_cost:
+            print(
+                f"[CONDITION]: [OK] h({state_name}) <= h({child_name}) + c: {heuristic_cost_parent} <= {heuristic_cost_child} + {child_cost}"
+            )
+        else:
+            print(
+                f"[CONDITION]: [ERR] h({state_name}) <= h({child_name}) + c: {heuristic_cost_parent} <= {heuristic_cost_child} + {child_cost}"
+            )
+            consistent = False
+
+    if violations_only:
+        print(f"[EDGES_CHECKED]: {len(graph.targets)}")
+        print(f"[VIOLATIONS]: {len(checked)}")
     if consistent:
         print("[CONCLUSION]: Heuristic is consistent.")
     else:
         print("[CONCLUSION]: Heuristic is not consistent.")
 
 
+def graph_search(alg: str, open_list=None, mem_limit: int = None, stats=None):
+    return {
+        "bfs": partial(bfs_graph, stats=stats),
+        "ucs": partial(ucs_graph, open_list=open_list, stats=stats),
+        "astar": partial(astar_graph, open_list=open_list, stats=stats),
+        "bibfs": partial(bibfs_graph, stats=stats),
+        "biucs": partial(biucs_graph, stats=stats),
+        "idastar": partial(idastar_graph, stats=stats),
+        "smastar": partial(smastar_graph, mem_limit=mem_limit, stats=stats),
+    }[alg]
+
+
+def traced_peak_memory(search, *args) -> int:
+    tracemalloc.start()
+    try:
+        with redirect_stdout(io.StringIO()):
+            search(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measured_search(search, stats: SearchStats, *args, memory_search=None):
+    if stats is None:
+        return search(*args)
+    # tracing slows the search down several times over, so the peak comes
+    # from a separate pass over a fresh search and the timed run is untraced
+    if memory_search is not None:
+        stats.peak_memory = traced_peak_memory(memory_search, *args)
+    search_start = time.perf_counter()
+    try:
+        return search(*args)
+    finally:
+        stats.search_time = time.perf_counter() - search_start
+
+
+def read_queries(queries_path: str):
+    for query_no, line in enumerate(read_descriptor_lines(queries_path)):
+        initial_state, *goal_states = line.split(" ")
+        yield query_no, initial_state, goal_states
+
+
+def run_query(query):
+    graph, heuristic, alg, queue, mem_limit, with_stats = batch_query_data
+    query_no, initial_name, goal_names = query
+    record = {"query": query_no, "initial_state": initial_name}
+    try:
+        initial_state = graph.index(initial_name)
+        if goal_names:
+            goal_states = set(graph.index(x) for x in goal_names)
+        else:
+            goal_states = graph.goal_states
+            goal_names = sorted(graph.names[x] for x in goal_states)
+        record["goal_states"] = goal_names
+        open_list = queue_dict[queue]() if queue else None
+        stats = SearchStats() if with_stats else None
+        memory_search = None
+        if trace_memory:
+            memory_search = graph_search(
+                alg, queue_dict[queue]() if queue else None, mem_limit
+            )
+        result = measured_search(
+            graph_search(alg, open_list, mem_limit, stats),
+            stats,
+            initial_state,
+            goal_states,
+            graph,
+            heuristic,
+            memory_search=memory_search,
+        )
+    except KeyError as error:
+        record["error"] = f"unknown state {error.args[0]}"
+        return json.dumps(record)
+    except ValueError as error:
+        record["error"] = str(error)
+        return json.dumps(record)
+
+    if result is None:
+        record["found_solution"] = False
+    else:
+        cost, path, path_len, num_visited = result
+        record["found_solution"] = True
+        record["states_visited"] = num_visited
+        record["path_length"] = path_len
+        record["total_cost"] = cost
+        record["path"] = path
+    if stats is not None:
+        record["stats"] = stats.as_dict()
+    return json.dumps(record)
+
+
+def run_queries(
+    graph: StateGraph,
+    heuristic,
+    queries_path: str,
+    alg: str,
+    queue: str = None,
+    mem_limit: int = None,
+    workers: int = 1,
+    with_stats: bool = False,
+):
+    global batch_query_data
+    if alg in ("bibfs", "biucs"):
+        # build the reverse index once so forked workers share it
+        graph.reverse()
+    batch_query_data = (graph, heuristic, alg, queue, mem_limit, with_stats)
+    queries = read_queries(queries_path)
+    try:
+        if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+            for query in queries:
+                print(run_query(query))
+        else:
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                for record in pool.imap(run_query, queries, chunksize=16):
+                    print(record)
+    finally:
+        batch_query_data = None
+
+
+def print_stats(alg: str, stats: SearchStats):
+    if stats is not None:
+        print(json.dumps({"algorithm": alg, **stats.as_dict()}), file=sys.stderr)
+
+
 def main():
-    global measure_time
+    global measure_time, trace_memory
     parser = create_parser()
     args = parser.parse_args()
     measure_time = args.t
+    trace_memory = args.trace_memory
+
+    if args.trace_memory and not args.stats:
+        parser.error("--trace-memory requires --stats json")
+
+    if args.queries and not args.alg:
+        parser.error("--queries requires --alg algorithm")
 
-    if args.alg == "astar" and not args.h:
-        parser.error("--alg astar requires --h heuristic_descriptor")
+    check = args.check_optimistic or args.check_consistent
+    compiled = args.compile_ss or is_compiled_graph(args.ss)
+
+    heuristic_user = None
+    if args.alg in ("astar", "idastar", "smastar"):
+        heuristic_user = f"--alg {args.alg}"
+    elif check:
+        heuristic_user = (
+            "--check-consistent" if args.check_consistent else "--check-optimistic"
+        )
+    # a compiled descriptor may carry its own heuristic, which is only known
+    # once it is loaded
+    if heuristic_user and not args.h and not compiled:
+        parser.error(f"{heuristic_user} requires --h heuristic_descriptor")
+
+    stats = SearchStats() if args.stats else None
+    parse_start = time.perf_counter()
+
+    dict_algs = ("bfs", "ucs", "astar")
+    graph_only = args.queue or args.queries or args.alg not in dict_algs
+    if args.csr or compiled or check or graph_only:
+        graph, heuristic, heuristic_path = load_state_graph(
+            args.ss, args.h, args.compile_ss, use_mmap=args.mmap
+        )
+        if heuristic_user and heuristic is None:
+            parser.error(f"{heuristic_user} requires --h heuristic_descriptor")
+        if stats is not None:
+            stats.parse_time = time.perf_counter() - parse_start
+        if args.check_consistent:
+            check_consistent(
+                graph, heuristic, heuristic_path, args.violations_only, args.workers
+            )
+            return
+        if args.check_optimistic:
+            check_optimistic(graph, heuristic, heuristic_path)
+            return
+        if not args.alg:
+            return
+        if args.queries:
+            measure_time = False
+            run_queries(
+                graph,
+                heuristic,
+                args.queries,
+                args.alg,
+                args.queue,
+                args.mem_limit,
+                args.workers,
+                args.stats is not None,
+            )
+            return
+        open_list = queue_dict[args.queue]() if args.queue else None
+        search = graph_search(args.alg, open_list, args.mem_limit, stats)
+        memory_search = None
+        if trace_memory:
+            memory_search = graph_search(
+                args.alg,
+                queue_dict[args.queue]() if args.queue else None,
+                args.mem_limit,
+            )
+        try:
+            result = measured_search(
+                search,
+                stats,
+                graph.initial_state,
+                graph.goal_states,
+                graph,
+                heuristic,
+                memory_search=memory_search,
+            )
+        except ValueError as error:
+            parser.error(str(error))
+        print_stats(args.alg, stats)
+        if result is None:
+            exit(1)
+        cost, path, path_len, num_visited = result
+        # a heuristic carried by a compiled descriptor is only named when used,
+        # so the title matches a run on the text descriptor
+        title_heuristic = heuristic_path if heuristic_user else args.h
+        print_output(
+            args.alg, "yes", num_visited, path_len, cost, path, title_heuristic
+        )
+        if open_list is not None and args.alg in ("ucs", "astar"):
+            print(
+                f"[QUEUE]: {args.queue} pushes={open_list.pushes} "
+                f"pops={open_list.pops} stale_pops={open_list.stale_pops}"
+            )
+        return
 
     initial_state, goal_states, state_dict = generate_state_dict(
         args.ss,
         sort_children=True if args.alg == "bfs" else False,
-        sort_nodes=True if args.check_optimistic or args.check_consistent else False,
+        use_mmap=args.mmap,
     )
-
-    if args.check_consistent:
-        check_consistent(state_dict, args.h)
-    elif args.check_optimistic:
-        check_optimistic(goal_states, state_dict, args.h)
-    else:
-        alg_dict = {"bfs": bfs, "ucs": ucs, "astar": astar}
-        cost, path, path_len, num_visited = alg_dict[args.alg](
-            initial_state, goal_states, state_dict, args.h
-        )
-        print_output(args.alg, "yes", num_visited, path_len, cost, path, args.h)
+    alg_dict = {"bfs": bfs, "ucs": ucs, "astar": astar}
+    search = partial(alg_dict[args.alg], stats=stats)
+    memory_search = partial(alg_dict[args.alg]) if trace_memory else None
+    if args.alg == "astar":
+        # the heuristic file is parsed up front so it counts as parsing
+        heuristic_dict = generate_heuristic_dict(args.h, args.mmap)
+        search = partial(search, heuristic_dict=heuristic_dict)
+        if memory_search is not None:
+            memory_search = partial(memory_search, heuristic_dict=heuristic_dict)
+    if stats is not None:
+        stats.parse_time = time.perf_counter() - parse_start
+    cost, path, path_len, num_visited = measured_search(
+        search,
+        stats,
+        initial_state,
+        goal_states,
+        state_dict,
+        args.h,
+        memory_search=memory_search,
+    )
+    print_stats(args.alg, stats)
+    print_output(args.alg, "yes", num_visited, path_len, cost, path, args.h)
 
 
 if __name__ == "__main__":
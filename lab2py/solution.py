@@ -1,40 +1,79 @@
+import hashlib
+import heapq
+import io
+import json
+import multiprocessing
+import os
+import re
 import sys
-from itertools import combinations, product
-from collections import deque, defaultdict
-from time import time
-from copy import deepcopy
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import redirect_stdout
+
+saturation_data = None
+parallel_round_size = 256
+
+
+def encode_clause(literals, atom_ids: dict) -> tuple:
+    positive = negative = 0
+    for literal in literals:
+        if literal[0] != "~":
+            positive |= 1 << atom_ids.setdefault(literal, len(atom_ids))
+        else:
+            negative |= 1 << atom_ids.setdefault(literal[1:], len(atom_ids))
+    return positive, negative
+
+
+def clause_literals(clause):
+    positive, negative = clause
+    while positive:
+        bit = positive & -positive
+        yield bit, 0
+        positive ^= bit
+    while negative:
+        bit = negative & -negative
+        yield 0, bit
+        negative ^= bit
+
+
+def clause_length(clause) -> int:
+    return bin(clause[0]).count("1") + bin(clause[1]).count("1")
+
+
+def decode_clause(clause, atom_names: list) -> str:
+    if atom_names is None:
+        return decode_lifted_clause(clause)
+    literals = sorted(
+        ((positive | negative).bit_length() - 1, positive == 0)
+        for positive, negative in clause_literals(clause)
+    )
+    return " v ".join(
+        f"~{atom_names[atom]}" if negated else atom_names[atom]
+        for atom, negated in literals
+    )
 
 
 def parse_input_resolution(clauses_path: str, goal_clause=None):
     try:
         with open(clauses_path, "r", encoding="utf-8") as f:
-            lines = [x.strip().lower() for x in f.readlines() if x[0] != "#"]
-            all_clauses = [
-                frozenset(
-                    (literal, True) if literal[0] != "~" else (literal[1:], False)
-                    for literal in line.split(" v ")
-                )
-                for line in lines
-            ]
+            lines = [x.strip() for x in f.readlines() if x[0] != "#"]
+            if any("(" in line for line in lines):
+                return parse_lifted_clauses(lines, goal_clause)
+            lines = [x.lower() for x in lines]
+            atom_ids = dict()
+            all_clauses = [encode_clause(line.split(" v "), atom_ids) for line in lines]
             if goal_clause is None:
                 clauses = set(all_clauses[:-1])
-                goal_clauses = set(
-                    frozenset(((literal, state),)) for literal, state in all_clauses[-1]
-                )
+                goal_clauses = set(clause_literals(all_clauses[-1]))
             else:
                 clauses = set(all_clauses)
                 goal_clauses = set(
-                    frozenset(((literal, True),))
-                    if literal[0] != "~"
-                    else frozenset(((literal[1:], False),))
+                    encode_clause([literal], atom_ids)
                     for literal in goal_clause.split(" v ")
                 )
-            goal_clauses_negated = set()
-            for clause in goal_clauses:
-                goal_clauses_negated |= set(
-                    frozenset(((literal, not state),)) for literal, state in clause
-                )
-            return clauses, goal_clauses, goal_clauses_negated
+            goal_clauses_negated = set(
+                (negative, positive) for positive, negative in goal_clauses
+            )
+            return clauses, goal_clauses, goal_clauses_negated, list(atom_ids)
     except OSError:
         print("Invalid path!", file=sys.stderr)
         exit(1)
@@ -54,64 +93,44 @@ def parse_instructions_cooking(instructions_path: str):
 
 
 def get_resolution_list(
-    given_clauses, goal_clause_negated, resolution_dict: defaultdict
+    given_clauses, goal_clause_negated, resolution_dict: defaultdict, atom_names: list
 ):
-    resolution_list = list()
-    given_used = list()
-    resolution_list.append("NIL")
-    to_check = deque()
-    to_check.extend(resolution_dict["NIL"])
+    premises = list()
+    derived = list()
+    visited = set()
+    # post-order walk, so every clause is listed after both of its parents
+    to_check = [("NIL", False)]
     while to_check:
-        current = to_check.pop()
+        current, expanded = to_check.pop()
+        if expanded:
+            derived.append(current)
+            continue
+        if current in visited:
+            continue
+        visited.add(current)
         if current in given_clauses or current in goal_clause_negated:
-            given_used.append(current)
+            premises.append(current)
             continue
-        to_check.extend(resolution_dict[current])
-        resolution_list.append(current)
-    resolution_list.extend(given_used)
-    resolution_list_ordered = list()
-    resolution_list.reverse()
-    separated = False
-    for index, resolvent in enumerate(resolution_list, start=1):
-        if resolvent != "NIL":
-            if resolvent not in given_clauses and resolvent not in goal_clause_negated:
-                if not separated:
-                    splitter = index - 1
-                    separated = True
-                c1_index = resolution_list.index(resolution_dict[resolvent][0]) + 1
-                c2_index = resolution_list.index(resolution_dict[resolvent][1]) + 1
-                resolution_list_ordered.append(
-                    (
-                        index,
-                        " v ".join(
-                            [
-                                literal if state else f"~{literal}"
-                                for literal, state in resolvent
-                            ]
-                        ),
-                        (c1_index, c2_index),
-                    )
-                )
-            else:
-                resolution_list_ordered.append(
-                    (
-                        index,
-                        " v ".join(
-                            [
-                                literal if state else f"~{literal}"
-                                for literal, state in resolvent
-                            ]
-                        ),
-                        "",
-                    )
-                )
-        else:
-            if not separated:
-                splitter = index - 1
-            c1_index = resolution_list.index(resolution_dict[resolvent][0]) + 1
-            c2_index = resolution_list.index(resolution_dict[resolvent][1]) + 1
-            resolution_list_ordered.append((index, resolvent, (c1_index, c2_index)))
-    return resolution_list_ordered, splitter
+        to_check.append((current, True))
+        for parent in reversed(resolution_dict[current]):
+            if parent not in visited:
+                to_check.append((parent, False))
+    indices = {
+        clause: index for index, clause in enumerate(premises + derived, start=1)
+    }
+
+    def resolution_list():
+        for clause in premises:
+            yield indices[clause], decode_clause(clause, atom_names), ""
+        for clause in derived:
+            c1, c2 = resolution_dict[clause]
+            yield (
+                indices[clause],
+                clause if clause == "NIL" else decode_clause(clause, atom_names),
+                (indices[c1], indices[c2]),
+            )
+
+    return resolution_list(), len(premises)
 
 
 def print_resolution(
@@ -120,146 +139,1058 @@ def print_resolution(
     goal_clause,
     goal_clause_negated,
     given_clauses,
+    atom_names: list,
+    proof_file=None,
 ):
+    goal = " v ".join([decode_clause(clause, atom_names) for clause in goal_clause])
     if not status:
         print(
             "\n".join(
                 [
-                    f"{index}. "
-                    + " v ".join(
-                        [
-                            literal if state else f"~{literal}"
-                            for literal, state in clause
-                        ]
-                    )
+                    f"{index}. {decode_clause(clause, atom_names)}"
                     for index, clause in enumerate(given_clauses, start=1)
                 ]
-            )
-        )
-        print("=" * 15)
-        print(
-            f'[CONCLUSION]: {" v ".join([literal if state else f"~{literal}" for literal, state in [x for fs in goal_clause for x in fs]])} is unknown'
+            ),
+            file=proof_file,
         )
+        print("=" * 15, file=proof_file)
+        print(f"[CONCLUSION]: {goal} is unknown")
     else:
         resolution_list, splitter = get_resolution_list(
-            given_clauses, goal_clause_negated, resolution_dict
+            given_clauses, goal_clause_negated, resolution_dict, atom_names
         )
-        print(
-            "\n".join(
-                [
-                    f"{index}. {clause} {origin}"
-                    for index, clause, origin in resolution_list[:splitter]
-                ]
-            )
+        # lines are written as they are rendered, so a long proof is never
+        # held in memory as one formatted string
+        for index, clause, origin in resolution_list:
+            print(f"{index}. {clause} {origin}", file=proof_file)
+            if index == splitter:
+                print("=" * 15, file=proof_file)
+        print("=" * 15, file=proof_file)
+        print(f"[CONCLUSION]: {goal} is true")
+
+
+def is_valid(resolvent):
+    return resolvent[0] & resolvent[1] != 0
+
+
+def find_subsumer(clause, index: defaultdict):
+    # a subsumer shares all of its literals with the clause, so it is indexed
+    # under any of them
+    positive, negative = clause
+    for literal in clause_literals(clause):
+        for other in index[literal]:
+            if other[0] & ~positive == 0 and other[1] & ~negative == 0:
+                return other
+    return None
+
+
+def subsumed_clauses(clause, index: defaultdict):
+    positive, negative = clause
+    candidates = min((index[literal] for literal in clause_literals(clause)), key=len)
+    return [
+        other
+        for other in candidates
+        if other != clause and positive & ~other[0] == 0 and negative & ~other[1] == 0
+    ]
+
+
+def insert_clause(clause, index: defaultdict, active: set, subsumers: set):
+    subsumer = find_subsumer(clause, index)
+    if subsumer is not None:
+        subsumers.add(subsumer)
+        return False
+    for other in subsumed_clauses(clause, index):
+        for literal in clause_literals(other):
+            index[literal].discard(other)
+        active.remove(other)
+        subsumers.add(clause)
+    for literal in clause_literals(clause):
+        index[literal].add(clause)
+    active.add(clause)
+    return True
+
+
+def resolve(c1, c2):
+    complementary = (c1[0] & c2[1]) | (c1[1] & c2[0])
+    # resolving on one of several complementary pairs leaves a tautology
+    if complementary == 0 or complementary & (complementary - 1):
+        return False
+    resolvent = (c1[0] | c2[0]) & ~complementary, (c1[1] | c2[1]) & ~complementary
+    if resolvent == (0, 0):
+        return True
+    return resolvent
+
+
+def resolve_chunk(task):
+    return saturation_data.resolve_chunk(*task)
+
+
+def replay_round(update):
+    saturation_data.replay_round(*update)
+
+
+class Saturation:
+    def __init__(self, goal_clause_negated, clauses, workers: int = 1) -> None:
+        self.__workers = workers
+        self.__round = (list(), list())
+        self.__resolution_dict = defaultdict(tuple)
+        self.__index = defaultdict(set)
+        self.__active = set()
+        self.__given = set()
+        self.__parents = set()
+        self.__subsumers = set()
+        self.__new = set()
+        self.__new_given = set()
+        self.__pool = None
+        self.__barrier = None
+        self.__replay = list()
+        for clause in sorted(goal_clause_negated, key=clause_length):
+            if not is_valid(clause) and self.__insert(clause):
+                self.__new.add(clause)
+        self.__insert_given(clauses)
+
+    @property
+    def resolution_dict(self) -> defaultdict:
+        return self.__resolution_dict
+
+    @property
+    def refuted(self) -> bool:
+        return "NIL" in self.__resolution_dict
+
+    def __insert(self, clause) -> bool:
+        return insert_clause(clause, self.__index, self.__active, self.__subsumers)
+
+    def __insert_given(self, clauses) -> list:
+        inserted = list()
+        for clause in sorted(clauses, key=clause_length):
+            if not is_valid(clause) and self.__insert(clause):
+                self.__given.add(clause)
+                inserted.append(clause)
+        return inserted
+
+    def add_given(self, clauses) -> None:
+        # set of support: an added clause only has to meet the derived side
+        self.__new_given.update(self.__insert_given(clauses))
+
+    def remove_given(self, clause) -> bool:
+        if clause in self.__parents or clause in self.__subsumers:
+            return False
+        if clause in self.__active:
+            for literal in clause_literals(clause):
+                self.__index[literal].discard(clause)
+            self.__active.remove(clause)
+        self.__given.discard(clause)
+        self.__new_given.discard(clause)
+        return True
+
+    def resolve_chunk(self, kind: int, start: int, end: int) -> list:
+        index, given = self.__index, self.__given
+        resolution_dict, active = self.__resolution_dict, self.__active
+        resolved = list()
+        for clause in self.__round[kind][start:end]:
+            for positive, negative in clause_literals(clause):
+                for other in index[(negative, positive)]:
+                    if kind == 0:
+                        c1, c2 = other, clause
+                    elif other in given:
+                        continue
+                    else:
+                        c1, c2 = clause, other
+                    resolvent = resolve(c1, c2)
+                    if resolvent == False:
+                        continue
+                    elif resolvent == True:
+                        resolved.append((c1, c2, resolvent))
+                        return resolved
+                    if resolvent not in resolution_dict and resolvent not in active:
+                        resolved.append((c1, c2, resolvent))
+        return resolved
+
+    def replay_round(self, clause_round, resolvents) -> None:
+        # a worker forked earlier in this saturation repeats the inserts the
+        # parent made since, in the same order, so its index iterates the same
+        self.__round = clause_round
+        self.__resolution_dict.update(dict.fromkeys(resolvents, ()))
+        for resolvent in resolvents:
+            self.__insert(resolvent)
+        # no worker can take a second update until every worker holds one
+        self.__barrier.wait()
+
+    def __parallel_round(self) -> bool:
+        return (
+            self.__workers > 1
+            and sum(len(clauses) for clauses in self.__round) >= parallel_round_size
+            and "fork" in multiprocessing.get_all_start_methods()
         )
-        print("=" * 15)
-        print(
-            "\n".join(
-                [
-                    f"{index}. {clause} {origin}"
-                    for index, clause, origin in resolution_list[splitter:]
-                ]
+
+    def __fork_pool(self):
+        global saturation_data
+        context = multiprocessing.get_context("fork")
+        self.__barrier = context.Barrier(self.__workers)
+        self.__replay = list()
+        saturation_data = self
+        self.__pool = context.Pool(self.__workers)
+
+    def __resolve_round(self):
+        sizes = [len(clauses) for clauses in self.__round]
+        if not self.__parallel_round():
+            for kind, size in enumerate(sizes):
+                yield from self.resolve_chunk(kind, 0, size)
+            return
+        # one pool serves the whole saturation, its workers only have to catch
+        # up with what the parent derived since they were last updated
+        if self.__pool is None:
+            self.__fork_pool()
+        update = (self.__round, self.__replay)
+        self.__replay = list()
+        self.__pool.map(replay_round, [update] * self.__workers, chunksize=1)
+        # chunks are contiguous slices merged back in order, and forked workers
+        # see the same index iteration order, so the pairs arrive exactly as a
+        # single process would have produced them
+        tasks = list()
+        for kind, size in enumerate(sizes):
+            step = max(1, -(-size // (4 * self.__workers)))
+            tasks.extend((kind, start, start + step) for start in range(0, size, step))
+        for resolved in self.__pool.map(resolve_chunk, tasks, chunksize=1):
+            yield from resolved
+
+    def saturate(self) -> bool:
+        global saturation_data
+        try:
+            return self.__saturate()
+        finally:
+            if self.__pool is not None:
+                self.__pool.terminate()
+                self.__pool = None
+                saturation_data = None
+
+    def __saturate(self) -> bool:
+        resolution_dict, active = self.__resolution_dict, self.__active
+        # every pair of older clauses was resolved in an earlier round, so only
+        # pairs involving a clause from the latest round can produce anything new
+        while not self.refuted and (self.__new or self.__new_given):
+            self.__round = (list(self.__new), list(self.__new_given))
+            resolvents = set()
+            for c1, c2, resolvent in self.__resolve_round():
+                if resolvent == True:
+                    resolution_dict["NIL"] = (c1, c2)
+                    self.__parents.update((c1, c2))
+                    break
+                if resolvent in resolution_dict or resolvent in active:
+                    continue
+                resolution_dict[resolvent] = (c1, c2)
+                self.__parents.update((c1, c2))
+                resolvents.add(resolvent)
+            self.__round = (list(), list())
+            self.__new_given = set()
+            inserted = sorted(resolvents, key=clause_length)
+            for resolvent in inserted:
+                self.__insert(resolvent)
+            if self.__pool is not None:
+                self.__replay.extend(inserted)
+            self.__new = set(
+                resolvent for resolvent in resolvents if resolvent in active
             )
-        )
-        print("=" * 15)
-        print(
-            f'[CONCLUSION]: {" v ".join([literal if state else f"~{literal}" for literal, state in [x for fs in goal_clause for x in fs]])} is true'
-        )
+        return self.refuted
+
 
+def refutation_resolution(
+    goal_clause,
+    goal_clause_negated,
+    clauses,
+    atom_names,
+    saturation=None,
+    proof_file=None,
+    workers: int = 1,
+):
+    if saturation is None:
+        saturation = Saturation(goal_clause_negated, clauses, workers)
+    print_resolution(
+        saturation.resolution_dict,
+        saturation.saturate(),
+        goal_clause,
+        goal_clause_negated,
+        clauses,
+        atom_names,
+        proof_file,
+    )
+    return saturation
 
-def remove_redundant(clauses, sos):
-    for c1, c2 in combinations(clauses | sos, 2):
-        if c1.issubset(c2):
-            if c2 in sos:
-                sos.remove(c2)
-            elif c2 in clauses:
-                clauses.remove(c2)
-        elif c2.issubset(c1):
-            if c1 in sos:
-                sos.remove(c1)
-            elif c1 in clauses:
-                clauses.remove(c1)
-    return clauses, sos
 
+def is_variable(term) -> bool:
+    return isinstance(term, str) and term[0].isupper()
 
-def is_valid(resolvent):
-    return not 2 * len(resolvent) == len(
-        resolvent | set((literal, not state) for literal, state in resolvent)
+
+def parse_term(tokens: list, position: int):
+    name = tokens[position]
+    position += 1
+    if position == len(tokens) or tokens[position] != "(":
+        return name if is_variable(name) else name.lower(), position
+    arguments = list()
+    while tokens[position] != ")":
+        argument, position = parse_term(tokens, position + 1)
+        arguments.append(argument)
+    return (name.lower(), *arguments), position + 1
+
+
+def parse_lifted_literal(literal: str):
+    negated = literal.startswith("~")
+    atom, _ = parse_term(re.findall(r"[^\s(),~]+|[(),]", literal[negated:]), 0)
+    if isinstance(atom, str):
+        atom = (atom.lower(),)
+    return negated, atom
+
+
+def parse_lifted_clauses(lines: list, goal_clause=None):
+    all_clauses = [
+        [parse_lifted_literal(literal) for literal in line.split(" v ")]
+        for line in lines
+        if line
+    ]
+    if goal_clause is None:
+        *given_clauses, goal = all_clauses
+    else:
+        given_clauses = all_clauses
+        goal = [parse_lifted_literal(literal) for literal in goal_clause.split(" v ")]
+    # dicts instead of sets keep the file order, which the printed proof and
+    # the order of the saturation rounds depend on
+    clauses = dict.fromkeys(canonical_clause(clause) for clause in given_clauses)
+    goal_clauses = dict.fromkeys((literal,) for literal in goal)
+    # the goal is universally closed, so its negation gets skolem constants
+    goal_clauses_negated = dict.fromkeys(
+        canonical_clause([(not negated, skolemize(atom))]) for negated, atom in goal
     )
+    return clauses, goal_clauses, goal_clauses_negated, None
+
+
+def decode_term(term) -> str:
+    if isinstance(term, str):
+        return term
+    if len(term) == 1:
+        return term[0]
+    return f"{term[0]}({', '.join(decode_term(x) for x in term[1:])})"
 
 
-def remove_irrelevant(clauses, sos):
-    return set(resolvent for resolvent in clauses if not is_valid(resolvent)), set(
-        resolvent for resolvent in sos if not is_valid(resolvent)
+def decode_lifted_clause(clause) -> str:
+    return " v ".join(
+        f"~{decode_term(atom)}" if negated else decode_term(atom)
+        for negated, atom in clause
     )
 
 
-def resolve(c1, c2):
-    c1 = set(c1)
-    c2 = set(c2)
-    for literal, state in set(c1):
-        if (literal, not state) in c2:
-            c1.remove((literal, state))
-            c2.remove((literal, not state))
-            if len(c1 | c2) == 0:
+def skolemize(term):
+    if is_variable(term):
+        return f"sk_{term.lower()}"
+    if isinstance(term, tuple):
+        return tuple(skolemize(x) for x in term)
+    return term
+
+
+def erase_variables(term):
+    if is_variable(term):
+        return "*"
+    if isinstance(term, tuple):
+        return tuple(erase_variables(x) for x in term)
+    return term
+
+
+def rename_variables(term, names: dict, prefix: str = "X"):
+    if is_variable(term):
+        return names.setdefault(term, f"{prefix}{len(names)}")
+    if isinstance(term, tuple):
+        return tuple(rename_variables(x, names, prefix) for x in term)
+    return term
+
+
+def canonical_clause(literals) -> tuple:
+    # literals are ordered without looking at variable names and then renamed
+    # in order, so most variants of a clause end up as the same tuple
+    names = dict()
+    return tuple(
+        rename_variables(literal, names)
+        for literal in sorted(
+            set(literals), key=lambda x: (repr(erase_variables(x)), repr(x))
+        )
+    )
+
+
+def term_depth(term) -> int:
+    if isinstance(term, str):
+        return 1
+    return 1 + max((term_depth(x) for x in term[1:]), default=0)
+
+
+def walk(term, substitution: dict):
+    while is_variable(term) and term in substitution:
+        term = substitution[term]
+    return term
+
+
+def occurs(variable: str, term, substitution: dict) -> bool:
+    term = walk(term, substitution)
+    if term == variable:
+        return True
+    return isinstance(term, tuple) and any(
+        occurs(variable, x, substitution) for x in term[1:]
+    )
+
+
+def unify(x, y, substitution: dict):
+    to_unify = [(x, y)]
+    while to_unify:
+        x, y = to_unify.pop()
+        x, y = walk(x, substitution), walk(y, substitution)
+        if x == y:
+            continue
+        if is_variable(y):
+            x, y = y, x
+        if is_variable(x):
+            if occurs(x, y, substitution):
+                return None
+            substitution[x] = y
+        elif (
+            isinstance(x, tuple)
+            and isinstance(y, tuple)
+            and x[0] == y[0]
+            and len(x) == len(y)
+        ):
+            to_unify.extend(zip(x[1:], y[1:]))
+        else:
+            return None
+    return substitution
+
+
+def substitute(term, substitution: dict):
+    term = walk(term, substitution)
+    if isinstance(term, tuple):
+        return tuple(substitute(x, substitution) for x in term)
+    return term
+
+
+def match(pattern, term, substitution: dict):
+    # one-way unification, only the variables of the pattern get bound
+    to_match = [(pattern, term)]
+    while to_match:
+        pattern, term = to_match.pop()
+        if is_variable(pattern):
+            if substitution.setdefault(pattern, term) != term:
+                return None
+        elif isinstance(pattern, tuple):
+            if (
+                not isinstance(term, tuple)
+                or pattern[0] != term[0]
+                or len(pattern) != len(term)
+            ):
+                return None
+            to_match.extend(zip(pattern[1:], term[1:]))
+        elif pattern != term:
+            return None
+    return substitution
+
+
+def subsumes(general, specific) -> bool:
+    def extend(position, substitution):
+        if position == len(general):
+            return True
+        for literal in specific:
+            matched = match(general[position], literal, dict(substitution))
+            if matched is not None and extend(position + 1, matched):
                 return True
-            else:
-                return frozenset(c1 | c2)
-    return False
+        return False
 
+    return len(general) <= len(specific) and extend(0, dict())
 
-def refutation_resolution(goal_clause, goal_clause_negated, clauses):
-    resolution_dict = defaultdict(tuple)
-    now = time()
-    sos = set()
-    sos |= goal_clause_negated
-    given_clauses = deepcopy(clauses)
-    while True:
-        clauses, sos = remove_irrelevant(clauses, sos)
-        clauses, sos = remove_redundant(clauses, sos)
-        new = set()
-        for c1, c2 in product(clauses | sos, sos):
-            if c1 == c2:
+
+def is_lifted_valid(clause) -> bool:
+    literals = set(clause)
+    return any((not negated, atom) in literals for negated, atom in clause)
+
+
+def literal_symbols(literal) -> list:
+    # preorder walk of the atom, variables all collapse to the same wildcard
+    symbols = [literal[0]]
+    to_flatten = [literal[1]]
+    while to_flatten:
+        term = to_flatten.pop()
+        if is_variable(term):
+            symbols.append("*")
+        elif isinstance(term, str):
+            symbols.append((term, 0))
+        else:
+            symbols.append((term[0], len(term) - 1))
+            to_flatten.extend(reversed(term[1:]))
+    return symbols
+
+
+def skip_term(symbols: list, position: int) -> int:
+    remaining = 1
+    while remaining:
+        symbol = symbols[position]
+        remaining += (0 if symbol == "*" else symbol[1]) - 1
+        position += 1
+    return position
+
+
+class DiscriminationTree:
+    def __init__(self) -> None:
+        self.__root = dict()
+
+    def add(self, symbols: list, entry) -> None:
+        node = self.__root
+        for symbol in symbols:
+            node = node.setdefault(symbol, dict())
+        node[entry] = None
+
+    def remove(self, symbols: list, entry) -> None:
+        path = [self.__root]
+        for symbol in symbols:
+            path.append(path[-1][symbol])
+        del path[-1][entry]
+        for symbol, node in zip(reversed(symbols), reversed(path[:-1])):
+            if node[symbol]:
+                break
+            del node[symbol]
+
+    def __skip(self, node: dict):
+        to_skip = [(node, 1)]
+        while to_skip:
+            node, remaining = to_skip.pop()
+            if remaining == 0:
+                yield node
                 continue
-            resolvent = resolve(c1, c2)
-            if resolvent == False:
+            for symbol, child in node.items():
+                arity = 0 if symbol == "*" else symbol[1]
+                to_skip.append((child, remaining - 1 + arity))
+
+    def unifiable(self, symbols: list) -> list:
+        # a superset of the entries whose literal unifies with the query, a
+        # wildcard on either side swallows a whole subterm of the other side
+        found = list()
+        to_visit = [(self.__root, 0)]
+        while to_visit:
+            node, position = to_visit.pop()
+            if position == len(symbols):
+                found.extend(node)
                 continue
-            elif resolvent == True:
-                resolution_dict["NIL"] = (c1, c2)
-                print_resolution(
-                    resolution_dict,
-                    True,
-                    goal_clause,
-                    goal_clause_negated,
-                    given_clauses,
+            symbol = symbols[position]
+            if symbol == "*":
+                to_visit.extend((child, position + 1) for child in self.__skip(node))
+                continue
+            if "*" in node:
+                to_visit.append((node["*"], skip_term(symbols, position)))
+            if symbol in node:
+                to_visit.append((node[symbol], position + 1))
+        return found
+
+
+def lifted_resolve(c1, position1: int, c2, position2: int):
+    # the second clause is standardized apart before unifying, with one renaming
+    # for the whole clause so its literals keep sharing their variables
+    names = dict()
+    c2 = tuple(rename_variables(literal, names, "Y") for literal in c2)
+    substitution = unify(c1[position1][1], c2[position2][1], dict())
+    if substitution is None:
+        return list()
+    literals = [
+        substitute(literal, substitution)
+        for clause, position in ((c1, position1), (c2, position2))
+        for index, literal in enumerate(clause)
+        if index != position
+    ]
+    if not literals:
+        return True
+    # factors are kept next to the plain resolvent, which binary resolution
+    # alone would need to stay complete
+    resolvents = [canonical_clause(literals)]
+    for resolvent in resolvents:
+        for i, (negated, atom) in enumerate(resolvent):
+            for other_negated, other_atom in resolvent[i + 1 :]:
+                if negated != other_negated:
+                    continue
+                substitution = unify(atom, other_atom, dict())
+                if substitution is None:
+                    continue
+                factor = canonical_clause(
+                    substitute(literal, substitution) for literal in resolvent
                 )
-                return
-            resolution_dict[resolvent] = (c1, c2)
-            new.add(resolvent)
-        if new.issubset(clauses | sos):
+                if factor not in resolvents:
+                    resolvents.append(factor)
+    return resolvents
+
+
+class LiftedSaturation:
+    def __init__(self, goal_clause_negated, clauses, max_depth: int = 8) -> None:
+        self.__max_depth = max_depth
+        self.__resolution_dict = defaultdict(tuple)
+        self.__index = DiscriminationTree()
+        self.__active = dict()
+        self.__new = dict()
+        for clause in sorted(goal_clause_negated, key=len):
+            if not is_lifted_valid(clause) and self.__insert(clause):
+                self.__new[clause] = None
+        for clause in sorted(clauses, key=len):
+            if not is_lifted_valid(clause):
+                self.__insert(clause)
+
+    @property
+    def resolution_dict(self) -> defaultdict:
+        return self.__resolution_dict
+
+    @property
+    def refuted(self) -> bool:
+        return "NIL" in self.__resolution_dict
+
+    def __candidates(self, literal, negated: bool) -> list:
+        symbols = literal_symbols(literal)
+        symbols[0] = negated
+        return self.__index.unifiable(symbols)
+
+    def __insert(self, clause) -> bool:
+        # a subsumer generalizes every literal of the clause, so it is found
+        # under any of them, and a subsumed clause holds an instance of
+        # every literal of the new one
+        for literal in clause:
+            for other, _ in self.__candidates(literal, literal[0]):
+                if subsumes(other, clause):
+                    return False
+        for other, _ in self.__candidates(clause[0], clause[0][0]):
+            if other in self.__active and other != clause and subsumes(clause, other):
+                for position, literal in enumerate(other):
+                    self.__index.remove(literal_symbols(literal), (other, position))
+                del self.__active[other]
+        for position, literal in enumerate(clause):
+            self.__index.add(literal_symbols(literal), (clause, position))
+        self.__active[clause] = None
+        return True
+
+    def __resolve_round(self, clauses: list):
+        for clause in clauses:
+            for position, literal in enumerate(clause):
+                for other, other_position in self.__candidates(literal, not literal[0]):
+                    resolvents = lifted_resolve(other, other_position, clause, position)
+                    if resolvents == True:
+                        yield other, clause, True
+                        return
+                    for resolvent in resolvents:
+                        if is_lifted_valid(resolvent) or self.__max_depth < max(
+                            term_depth(atom) for _, atom in resolvent
+                        ):
+                            continue
+                        yield other, clause, resolvent
+
+    def saturate(self) -> bool:
+        resolution_dict, active = self.__resolution_dict, self.__active
+        # first-order saturation need not terminate, the term depth bound is
+        # what keeps the set of derivable clauses finite
+        while not self.refuted and self.__new:
+            resolvents = dict()
+            for c1, c2, resolvent in self.__resolve_round(list(self.__new)):
+                if resolvent == True:
+                    resolution_dict["NIL"] = (c1, c2)
+                    break
+                if resolvent in resolution_dict or resolvent in active:
+                    continue
+                resolution_dict[resolvent] = (c1, c2)
+                resolvents[resolvent] = None
+            for resolvent in sorted(resolvents, key=len):
+                self.__insert(resolvent)
+            self.__new = dict.fromkeys(
+                resolvent for resolvent in resolvents if resolvent in active
+            )
+        return self.refuted
+
+
+def luby(index: int) -> int:
+    size, sequence = 1, 0
+    while size < index + 1:
+        sequence += 1
+        size = 2 * size + 1
+    while size - 1 != index:
+        size = (size - 1) >> 1
+        sequence -= 1
+        index %= size
+    return 1 << sequence
+
+
+def cdcl_solve(clauses: list, atom_count: int):
+    # literals are 2 * atom for positive and 2 * atom + 1 for negated atoms
+    database = [
+        [
+            2 * ((positive | negative).bit_length() - 1) + (positive == 0)
+            for positive, negative in clause_literals(clause)
+        ]
+        for clause in clauses
+    ]
+    antecedents = [None] * len(database)
+    watches = [list() for _ in range(2 * atom_count)]
+    assigns = [None] * atom_count
+    levels = [0] * atom_count
+    reasons = [None] * atom_count
+    phases = [1] * atom_count
+    activity = [0.0] * atom_count
+    order = [(0.0, atom) for atom in range(atom_count)]
+    trail = list()
+    trail_limits = list()
+    increment = 1.0
+
+    def value(literal):
+        assigned = assigns[literal >> 1]
+        if assigned is None:
+            return None
+        return assigned != (literal & 1)
+
+    def enqueue(literal, reason):
+        atom = literal >> 1
+        assigns[atom] = not literal & 1
+        levels[atom] = len(trail_limits)
+        reasons[atom] = reason
+        trail.append(literal)
+
+    def unsat_core(conflict):
+        core = set()
+        to_check = [conflict]
+        checked = set()
+        while to_check:
+            current = to_check.pop()
+            if current in checked:
+                continue
+            checked.add(current)
+            if antecedents[current] is None:
+                core.add(current)
+            else:
+                to_check.extend(antecedents[current])
+            for literal in database[current]:
+                if reasons[literal >> 1] is not None:
+                    to_check.append(reasons[literal >> 1])
+        return core
+
+    def propagate(head):
+        while head < len(trail):
+            false_literal = trail[head] ^ 1
+            head += 1
+            watching = watches[false_literal]
+            watches[false_literal] = list()
+            for position, index in enumerate(watching):
+                clause = database[index]
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if value(clause[0]) is True:
+                    watches[false_literal].append(index)
+                    continue
+                for other in range(2, len(clause)):
+                    if value(clause[other]) is not False:
+                        clause[1], clause[other] = clause[other], clause[1]
+                        watches[clause[1]].append(index)
+                        break
+                else:
+                    watches[false_literal].append(index)
+                    if value(clause[0]) is False:
+                        watches[false_literal].extend(watching[position + 1 :])
+                        return head, index
+                    enqueue(clause[0], index)
+        return head, None
+
+    def analyze(conflict):
+        nonlocal increment
+        learnt = [None]
+        used = [conflict]
+        seen = set()
+        pending = 0
+        position = len(trail) - 1
+        literal = None
+        clause = database[conflict]
+        while True:
+            for other in clause:
+                if other == literal:
+                    continue
+                atom = other >> 1
+                if atom in seen:
+                    continue
+                seen.add(atom)
+                if levels[atom] == 0:
+                    used.append(reasons[atom])
+                    continue
+                activity[atom] += increment
+                heapq.heappush(order, (-activity[atom], atom))
+                if levels[atom] == len(trail_limits):
+                    pending += 1
+                else:
+                    learnt.append(other)
+            while trail[position] >> 1 not in seen:
+                position -= 1
+            literal = trail[position]
+            position -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            used.append(reasons[literal >> 1])
+            clause = database[reasons[literal >> 1]]
+        learnt[0] = literal ^ 1
+        increment /= 0.95
+        if increment > 1e100:
+            for atom in range(atom_count):
+                activity[atom] *= 1e-100
+            increment *= 1e-100
+        backjump = 0
+        if len(learnt) > 1:
+            deepest = max(range(1, len(learnt)), key=lambda x: levels[learnt[x] >> 1])
+            learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+            backjump = levels[learnt[1] >> 1]
+        return learnt, used, backjump
+
+    def backtrack(level):
+        if len(trail_limits) <= level:
+            return
+        start = trail_limits[level]
+        for literal in trail[start:]:
+            atom = literal >> 1
+            phases[atom] = literal & 1
+            assigns[atom] = None
+            reasons[atom] = None
+            heapq.heappush(order, (-activity[atom], atom))
+        del trail[start:]
+        del trail_limits[level:]
+
+    for index, clause in enumerate(database):
+        if len(clause) == 0:
+            return False, {index}
+        if len(clause) == 1:
+            if value(clause[0]) is False:
+                return False, unsat_core(index)
+            if value(clause[0]) is None:
+                enqueue(clause[0], index)
+            continue
+        watches[clause[0]].append(index)
+        watches[clause[1]].append(index)
+
+    head = 0
+    conflicts = 0
+    restart = 0
+    restart_limit = 100 * luby(restart)
+    while True:
+        head, conflict = propagate(head)
+        if conflict is not None:
+            conflicts += 1
+            if not trail_limits:
+                return False, unsat_core(conflict)
+            learnt, used, backjump = analyze(conflict)
+            backtrack(backjump)
+            head = len(trail)
+            database.append(learnt)
+            antecedents.append(used)
+            if len(learnt) > 1:
+                watches[learnt[0]].append(len(database) - 1)
+                watches[learnt[1]].append(len(database) - 1)
+            enqueue(learnt[0], len(database) - 1)
+            continue
+        if conflicts >= restart_limit:
+            conflicts = 0
+            restart += 1
+            restart_limit = 100 * luby(restart)
+            backtrack(0)
+            head = len(trail)
+            continue
+        decision = None
+        while order:
+            _, atom = heapq.heappop(order)
+            if assigns[atom] is None:
+                decision = atom
+                break
+        if decision is None:
+            return True, None
+        trail_limits.append(len(trail))
+        enqueue(2 * decision + phases[decision], None)
+
+
+def sat_resolution(
+    goal_clause, goal_clause_negated, clauses, atom_names, proof, proof_file=None
+):
+    kb = sorted(
+        clause for clause in clauses | goal_clause_negated if not is_valid(clause)
+    )
+    satisfiable, core = cdcl_solve(kb, len(atom_names))
+    if satisfiable or not proof:
+        if proof:
             print_resolution(
-                resolution_dict, False, goal_clause, goal_clause_negated, given_clauses
+                defaultdict(tuple),
+                False,
+                goal_clause,
+                goal_clause_negated,
+                clauses,
+                atom_names,
+                proof_file,
             )
             return
-        sos |= new
+        goal = " v ".join([decode_clause(clause, atom_names) for clause in goal_clause])
+        print(f"[CONCLUSION]: {goal} is {'unknown' if satisfiable else 'true'}")
+        return
+    # the refutation only needs the clauses the solver's conflict depended on
+    core_clauses = set(kb[index] for index in core)
+    support = goal_clause_negated
+    satisfiable, _ = cdcl_solve(
+        sorted(core_clauses - goal_clause_negated), len(atom_names)
+    )
+    if not satisfiable:
+        # the set of support is only complete over a satisfiable remainder, so
+        # a core that contradicts itself without the goal seeds it whole
+        support = core_clauses
+    refutation_resolution(
+        goal_clause,
+        support,
+        core_clauses - support,
+        atom_names,
+        proof_file=proof_file,
+    )
+
+
+def clause_digest(clause: str) -> int:
+    normalized = " v ".join(sorted(set(clause.split(" v "))))
+    return int.from_bytes(hashlib.sha256(normalized.encode()).digest()[:8], "big")
 
 
-def add_clause(clauses_path, clause):
-    with open(clauses_path, "r") as f:
-        lines = [x.strip().lower() for x in f.readlines()]
-    lines.append(clause)
-    with open(clauses_path, "w") as f:
-        f.write("\n".join(lines) + "\n")
-    print(f"added {clause}")
+class QueryCache:
+    def __init__(self, max_size: int = 128, cache_path: str = None) -> None:
+        self.__max_size = max_size
+        self.__cache_path = cache_path
+        self.__entries = OrderedDict()
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                for key, rendered in json.load(f):
+                    self.__entries[tuple(key)] = rendered
+
+    def get(self, key: tuple):
+        rendered = self.__entries.get(key)
+        if rendered is not None:
+            self.__entries.move_to_end(key)
+        return rendered
+
+    def put(self, key: tuple, rendered: str) -> None:
+        self.__entries[key] = rendered
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__max_size:
+            self.__entries.popitem(last=False)
+
+    def save(self) -> None:
+        if self.__cache_path is not None:
+            with open(self.__cache_path, "w", encoding="utf-8") as f:
+                json.dump([[list(key), x] for key, x in self.__entries.items()], f)
+
+
+class KnowledgeBase:
+    def __init__(
+        self, clauses_path: str, query_cache: QueryCache = None, workers: int = 1
+    ) -> None:
+        self.__clauses_path = clauses_path
+        self.__workers = workers
+        try:
+            with open(clauses_path, "r", encoding="utf-8") as f:
+                self.__lines = [x.strip().lower() for x in f.readlines()]
+        except OSError:
+            print("Invalid path!", file=sys.stderr)
+            exit(1)
+        self.__modified = False
+        self.__atom_ids = dict()
+        self.__clause_counts = Counter(
+            encode_clause(line.split(" v "), self.__atom_ids)
+            for line in self.__lines
+            if line and line[0] != "#"
+        )
+        self.__saturations = dict()
+        self.__query_cache = QueryCache() if query_cache is None else query_cache
+        self.__version = 0
+        for line in self.__lines:
+            if line and line[0] != "#":
+                self.__version = (self.__version + clause_digest(line)) % 2**64
 
+    @property
+    def version(self) -> str:
+        # an order-independent digest of the clause multiset, so undoing an
+        # edit brings back the results cached for the earlier knowledge base
+        return f"{self.__version:016x}"
 
-def remove_clause(clauses_path, clause):
-    with open(clauses_path, "r") as f:
-        lines = [x.strip().lower() for x in f.readlines()]
-    lines.remove(clause)
-    with open(clauses_path, "w") as f:
-        f.write("\n".join(lines) + "\n")
-    print(f"removed {clause}")
+    @property
+    def clauses(self) -> set:
+        return set(self.__clause_counts)
+
+    @property
+    def atom_names(self) -> list:
+        return list(self.__atom_ids)
+
+    def parse_goal(self, goal_clause: str):
+        goal_clauses = set(
+            encode_clause([literal], self.__atom_ids)
+            for literal in goal_clause.split(" v ")
+        )
+        goal_clauses_negated = set(
+            (negative, positive) for positive, negative in goal_clauses
+        )
+        return goal_clauses, goal_clauses_negated
+
+    def add_clause(self, clause: str) -> None:
+        self.__lines.append(clause)
+        self.__modified = True
+        self.__version = (self.__version + clause_digest(clause)) % 2**64
+        encoded = encode_clause(clause.split(" v "), self.__atom_ids)
+        self.__clause_counts[encoded] += 1
+        if self.__clause_counts[encoded] == 1:
+            # resolution is monotonic, so every cached resolvent still holds
+            for saturation in self.__saturations.values():
+                saturation.add_given([encoded])
+        print(f"added {clause}")
+
+    def remove_clause(self, clause: str) -> None:
+        self.__lines.remove(clause)
+        self.__modified = True
+        self.__version = (self.__version - clause_digest(clause)) % 2**64
+        encoded = encode_clause(clause.split(" v "), self.__atom_ids)
+        self.__clause_counts[encoded] -= 1
+        if self.__clause_counts[encoded] == 0:
+            del self.__clause_counts[encoded]
+            # a saturation that derived anything from the clause is dropped
+            for goal in list(self.__saturations):
+                if not self.__saturations[goal].remove_given(encoded):
+                    del self.__saturations[goal]
+        print(f"removed {clause}")
+
+    def query(self, goal_clause: str, engine: str = "resolution", proof=False):
+        goal = " v ".join(sorted(set(goal_clause.split(" v "))))
+        key = (engine, proof, goal, self.version)
+        rendered = self.__query_cache.get(key)
+        if rendered is None:
+            output = io.StringIO()
+            with redirect_stdout(output):
+                self.__answer(goal_clause, engine, proof)
+            rendered = output.getvalue()
+            self.__query_cache.put(key, rendered)
+        print(rendered, end="")
+
+    def __answer(self, goal_clause: str, engine: str, proof: bool) -> None:
+        goal_clauses, goal_clauses_negated = self.parse_goal(goal_clause)
+        if engine == "sat":
+            sat_resolution(
+                goal_clauses,
+                goal_clauses_negated,
+                self.clauses,
+                self.atom_names,
+                proof,
+            )
+            return
+        key = frozenset(goal_clauses_negated)
+        self.__saturations[key] = refutation_resolution(
+            goal_clauses,
+            goal_clauses_negated,
+            self.clauses,
+            self.atom_names,
+            self.__saturations.get(key),
+            workers=self.__workers,
+        )
+
+    def save(self) -> None:
+        if self.__modified:
+            with open(self.__clauses_path, "w") as f:
+                f.write("\n".join(self.__lines) + "\n")
+            self.__modified = False
+        self.__query_cache.save()
 
 
 def print_clauses(clauses_path):
@@ -270,24 +1201,76 @@ def print_clauses(clauses_path):
 
 def main():
     keyword = sys.argv[1]
+    engine = "resolution"
+    if "--engine" in sys.argv:
+        engine = sys.argv[sys.argv.index("--engine") + 1]
+    if engine not in ("resolution", "sat"):
+        print("Invalid engine!", file=sys.stderr)
+        exit(1)
+    proof = "--proof" in sys.argv
+    workers = 1
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
     if keyword == "resolution":
-        clauses, goal_clause, goal_clause_negated = parse_input_resolution(sys.argv[2])
-        refutation_resolution(goal_clause, goal_clause_negated, clauses)
+        clauses, goal_clause, goal_clause_negated, atom_names = parse_input_resolution(
+            sys.argv[2]
+        )
+        saturation = None
+        if atom_names is None:
+            if engine == "sat":
+                print("SAT engine needs propositional clauses!", file=sys.stderr)
+                exit(1)
+            max_depth = 8
+            if "--max-depth" in sys.argv:
+                max_depth = int(sys.argv[sys.argv.index("--max-depth") + 1])
+            saturation = LiftedSaturation(goal_clause_negated, clauses, max_depth)
+        proof_file = None
+        if "--proof-file" in sys.argv:
+            proof_file = open(
+                sys.argv[sys.argv.index("--proof-file") + 1], "w", encoding="utf-8"
+            )
+        try:
+            if engine == "sat":
+                sat_resolution(
+                    goal_clause,
+                    goal_clause_negated,
+                    clauses,
+                    atom_names,
+                    proof or proof_file is not None,
+                    proof_file,
+                )
+            else:
+                refutation_resolution(
+                    goal_clause,
+                    goal_clause_negated,
+                    clauses,
+                    atom_names,
+                    saturation,
+                    proof_file=proof_file,
+                    workers=workers,
+                )
+        finally:
+            if proof_file is not None:
+                proof_file.close()
 
     elif keyword == "cooking":
         print_clauses(sys.argv[2])
         instructions = parse_instructions_cooking(sys.argv[3])
+        cache_path = None
+        if "--cache-file" in sys.argv:
+            cache_path = sys.argv[sys.argv.index("--cache-file") + 1]
+        knowledge_base = KnowledgeBase(
+            sys.argv[2], QueryCache(cache_path=cache_path), workers
+        )
         for literal, instruction in instructions:
             print(f"\nUser's command: {literal} {instruction}")
-            clauses, goal_clause, goal_clause_negated = parse_input_resolution(
-                sys.argv[2], goal_clause=literal
-            )
             if instruction == "?":
-                refutation_resolution(goal_clause, goal_clause_negated, clauses)
+                knowledge_base.query(literal, engine, proof)
             elif instruction == "+":
-                add_clause(sys.argv[2], literal)
+                knowledge_base.add_clause(literal)
             elif instruction == "-":
-                remove_clause(sys.argv[2], literal)
+                knowledge_base.remove_clause(literal)
+        knowledge_base.save()
 
     else:
         print("Invalid keyword argument!", file=sys.stderr)
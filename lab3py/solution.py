@@ -1,13 +1,25 @@
+import io
+import multiprocessing
 import sys
+from array import array
 from math import log2
 from collections import Counter, defaultdict
-from copy import deepcopy
+from contextlib import redirect_stdout
+from itertools import islice, repeat
 from typing import List, Tuple, Dict
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+id3_model = None
+
 
 class Node:
     def __init__(self, x: str, most_common_value: str, children=None):
         self.__x = x
+        self.__most_common_value = most_common_value
         if children is not None:
             self.__chil_dict = defaultdict(lambda: most_common_value)
             self.__chil_dict.update(children)
@@ -18,10 +30,174 @@ class Node:
     def x(self) -> str:
         return self.__x
 
+    @property
+    def most_common_value(self) -> str:
+        return self.__most_common_value
+
     @property
     def child_dict(self) -> dict:
         return self.__chil_dict
 
+    def __getstate__(self):
+        # the default factory is a lambda, so the children go over as a dict
+        children = None if self.__chil_dict is None else dict(self.__chil_dict)
+        return self.__x, self.__most_common_value, children
+
+    def __setstate__(self, state) -> None:
+        self.__init__(*state)
+
+
+class EncodedDataset:
+    def __init__(self, chunks) -> None:
+        self.__columns = dict()
+        codes = dict()
+        # chunks are encoded as they arrive, only the integer codes are kept
+        for chunk in chunks:
+            if not self.__columns:
+                *self.__features, self.__y = chunk.keys()
+                # flat buffers instead of tuples of ints, so forked workers
+                # read the parent's pages without touching any reference counts
+                self.__columns = {feature: array("i") for feature in chunk}
+                codes = {feature: dict() for feature in chunk}
+            for feature, values in chunk.items():
+                feature_codes = codes[feature]
+                self.__columns[feature].extend(
+                    feature_codes.setdefault(value, len(feature_codes))
+                    for value in values
+                )
+        self.__categories = {feature: list(x) for feature, x in codes.items()}
+
+    @property
+    def features(self) -> List[str]:
+        return self.__features
+
+    @property
+    def y(self) -> str:
+        return self.__y
+
+    @property
+    def columns(self) -> Dict[str, array]:
+        return self.__columns
+
+    @property
+    def categories(self) -> Dict[str, List[str]]:
+        return self.__categories
+
+    @property
+    def labels(self) -> array:
+        return self.__columns[self.__y]
+
+    @property
+    def size(self) -> int:
+        return len(self.labels)
+
+    def encode(self, dataset: dict, features: List[str]) -> Dict[str, array]:
+        # values never seen in training get the code right after the known ones
+        encoded = dict()
+        for feature in features:
+            codes = {
+                value: code for code, value in enumerate(self.__categories[feature])
+            }
+            column = dataset[feature]
+            encoded[feature] = array(
+                "i", map(codes.get, column, repeat(len(codes), len(column)))
+            )
+        return encoded
+
+
+class CompiledTree:
+    def __init__(self, root: Node, dataset: EncodedDataset, use_numpy: bool) -> None:
+        # per node: the feature it splits on (-1 for a leaf), where its child
+        # table starts, and the class it predicts when no child matches
+        self.__features = array("i")
+        self.__offsets = array("i")
+        self.__leaves = array("i")
+        self.__children = array("i")
+        self.__feature_names = list()
+        self.__classes = dataset.categories[dataset.y]
+        self.__use_numpy = use_numpy
+        class_ids = {label: code for code, label in enumerate(self.__classes)}
+        nodes = [root]
+        for node in nodes:
+            self.__leaves.append(class_ids[node.most_common_value])
+            if node.child_dict is None:
+                self.__features.append(-1)
+                self.__offsets.append(-1)
+                continue
+            categories = dataset.categories[node.x]
+            if node.x not in self.__feature_names:
+                self.__feature_names.append(node.x)
+            self.__features.append(self.__feature_names.index(node.x))
+            self.__offsets.append(len(self.__children))
+            # one slot per training value plus one for unseen values
+            children = [-1] * (len(categories) + 1)
+            for value, child in node.child_dict.items():
+                children[categories.index(value)] = len(nodes)
+                nodes.append(child)
+            self.__children.extend(children)
+
+    @property
+    def features(self) -> List[str]:
+        return self.__feature_names
+
+    def __predict_python(self, columns: List[array], size: int) -> array:
+        features, offsets = self.__features, self.__offsets
+        leaves, children = self.__leaves, self.__children
+        predictions = array("i")
+        for row in range(size):
+            node = 0
+            while features[node] >= 0:
+                child = children[offsets[node] + columns[features[node]][row]]
+                if child < 0:
+                    break
+                node = child
+            predictions.append(leaves[node])
+        return predictions
+
+    def __predict_numpy(self, columns: List[array], size: int):
+        features = np.frombuffer(self.__features, dtype=np.intc)
+        offsets = np.frombuffer(self.__offsets, dtype=np.intc)
+        children = np.frombuffer(self.__children, dtype=np.intc)
+        codes = np.array(
+            [np.frombuffer(column, dtype=np.intc) for column in columns], dtype=np.intp
+        ).reshape(len(columns), size)
+        # every row moves one level down per pass, until it hits a leaf or a
+        # value without a branch
+        nodes = np.zeros(size, dtype=np.intp)
+        active = np.arange(size)
+        while active.size:
+            split = features[nodes[active]]
+            active, split = active[split >= 0], split[split >= 0]
+            child = children[offsets[nodes[active]] + codes[split, active]]
+            active, child = active[child >= 0], child[child >= 0]
+            nodes[active] = child
+        return np.frombuffer(self.__leaves, dtype=np.intc)[nodes]
+
+    def predict(self, encoded: Dict[str, array], size: int) -> List[str]:
+        columns = [encoded[feature] for feature in self.__feature_names]
+        if self.__use_numpy and columns:
+            predictions = self.__predict_numpy(columns, size).tolist()
+        else:
+            predictions = self.__predict_python(columns, size)
+        return [self.__classes[prediction] for prediction in predictions]
+
+
+def vectorized_entropy(counts):
+    totals = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = counts / totals
+        terms = np.where(counts > 0, p * np.log2(p), 0.0)
+    # summing in sorted order makes permuted count tables tie exactly
+    return -np.sort(terms, axis=-1).sum(axis=-1)
+
+
+def build_subtree(task):
+    return id3_model.build_subtree(*task)
+
+
+def feature_gains(task):
+    return id3_model.feature_gains(*task)
+
 
 def dfs_print_tree(root: Node, depth=1, path="") -> None:
     if root.child_dict is None:
@@ -32,10 +208,23 @@ def dfs_print_tree(root: Node, depth=1, path="") -> None:
 
 
 class ID3:
-    def __init__(self, max_depth: int = -1, verbose: bool = False) -> None:
+    def __init__(
+        self,
+        max_depth: int = -1,
+        verbose: bool = False,
+        use_numpy: bool = True,
+        n_jobs: int = 1,
+    ) -> None:
         self.__max_depth = max_depth
+        self.__n_jobs = n_jobs
+        self.__pool = None
         self.__verbose = verbose
+        self.__use_numpy = use_numpy and np is not None
         self.__root: Node = None
+        self.__dataset: EncodedDataset = None
+        self.__codes = None
+        self.__labels = None
+        self.__compiled: CompiledTree = None
 
     def __validation_print(self, features: List, entropies: List) -> None:
         print(
@@ -48,61 +237,82 @@ class ID3:
         )
 
     def __calculate_entropy(self, outcomes: List[int]) -> float:
-        return -sum(
-            [
-                float(x) / sum(outcomes) * log2(float(x) / sum(outcomes))
-                for x in outcomes
-            ]
-        )
-
-    def __filter_by_v(self, d: dict, y: str, v: str) -> dict:
-        return_d = deepcopy(d)
-        to_remove = set()
-        for key in return_d.keys():
-            [
-                to_remove.add(index)
-                for index in range(len(return_d[key]))
-                if return_d[y][index] != v
-            ]
-        for key in return_d.keys():
-            return_d[key] = [
-                el for index, el in enumerate(return_d[key]) if index not in to_remove
-            ]
-        return return_d
+        total = sum(outcomes)
+        return -sum([float(x) / total * log2(float(x) / total) for x in outcomes])
 
-    def __ig(self, d: dict, x: str) -> float:
-        outcomes = [count for _, count in Counter(d[list(d.keys())[-1]]).most_common()]
-        init_dataset_entropy = self.__calculate_entropy(outcomes)
+    def __ig(self, rows: List[int], x: str, outcomes: List[int]) -> float:
+        # groups follow the first occurrence of each value among the rows, as
+        # the summation order has to stay the same for ties to break the same
+        column, labels = self.__dataset.columns[x], self.__dataset.labels
         outcomes_filtered = defaultdict(list)
-        for index, value in enumerate(d[x]):
-            outcomes_filtered[value].append(d[list(d.keys())[-1]][index])
-        for key, value in outcomes_filtered.items():
-            outcomes_filtered[key] = [
-                count for _, count in Counter(value).most_common()
-            ]
+        for row in rows:
+            outcomes_filtered[column[row]].append(labels[row])
         expected_entropy = sum(
             [
-                float(sum(outcome)) / sum(outcomes) * self.__calculate_entropy(outcome)
-                if len(outcome) > 0
-                else 0
+                float(len(outcome))
+                / sum(outcomes)
+                * self.__calculate_entropy(
+                    [count for _, count in Counter(outcome).most_common()]
+                )
                 for outcome in outcomes_filtered.values()
             ]
         )
-        return init_dataset_entropy - expected_entropy
+        return self.__calculate_entropy(outcomes) - expected_entropy
+
+    def __gains(self, rows: List[int], features: List, outcomes: List[int]) -> List:
+        if not self.__use_numpy and self.__pool is not None:
+            step = -(-len(features) // self.__n_jobs)
+            chunks = self.__pool.map(
+                feature_gains,
+                [(features[x : x + step],) for x in range(0, len(features), step)],
+            )
+            return [entropy for chunk in chunks for entropy in chunk]
+        if not self.__use_numpy:
+            return [self.__ig(rows, x, outcomes) for x in features]
+        # one feature x value x class contingency tensor for the whole node
+        index = np.array(rows)
+        feature_ids = [self.__dataset.features.index(x) for x in features]
+        codes = self.__codes[np.ix_(feature_ids, index)]
+        values = int(codes.max()) + 1
+        classes = len(self.__dataset.categories[self.__dataset.y])
+        flat = (np.arange(len(features))[:, None] * values + codes) * classes
+        counts = np.bincount(
+            (flat + self.__labels[index]).ravel(),
+            minlength=len(features) * values * classes,
+        ).reshape(len(features), values, classes)
+        weights = counts.sum(axis=2) / len(rows)
+        expected_entropy = np.sort(weights * vectorized_entropy(counts), axis=1)
+        return (
+            self.__calculate_entropy(outcomes) - expected_entropy.sum(axis=1)
+        ).tolist()
+
+    def __label_counts(self, rows: List[int]) -> List[Tuple[int, int]]:
+        return Counter(self.__dataset.labels[row] for row in rows).most_common()
+
+    def __most_common(self, label_counts: List[Tuple[int, int]]) -> str:
+        categories = self.__dataset.categories[self.__dataset.y]
+        return min((-count, categories[label]) for label, count in label_counts)[1]
 
     def __id3(
-        self, d: dict, d_parent: dict, features: List, y: str, current_depth: int
+        self,
+        rows: List[int],
+        parent_rows: List[int],
+        features: List,
+        current_depth: int,
     ) -> Node:
-        if len(d) == 0:
-            v = sorted(Counter(d_parent[y]).most_common(), key=lambda x: (-x[1], x[0]))[
-                0
-            ][0]
+        if len(rows) == 0:
+            v = self.__most_common(self.__label_counts(parent_rows))
             return Node(v, v)
-        v = sorted(Counter(d[y]).most_common(), key=lambda x: (-x[1], x[0]))[0][0]
-        d_yv = self.__filter_by_v(d, y, v)
-        if len(features) == 0 or d == d_yv or current_depth == self.__max_depth:
+        label_counts = self.__label_counts(rows)
+        v = self.__most_common(label_counts)
+        if (
+            len(features) == 0
+            or len(label_counts) == 1
+            or current_depth == self.__max_depth
+        ):
             return Node(v, v)
-        entropies = [self.__ig(d, x) for x in features]
+        outcomes = [count for _, count in label_counts]
+        entropies = self.__gains(rows, features, outcomes)
 
         if self.__verbose:
             self.__validation_print(features, entropies)
@@ -110,48 +320,119 @@ class ID3:
         max_entropy = max(entropies)
         max_index = entropies.index(max_entropy)
         x = features[max_index]
+        column, categories = self.__dataset.columns[x], self.__dataset.categories[x]
+        rows_by_value = defaultdict(list)
+        for row in rows:
+            rows_by_value[column[row]].append(row)
+        features_next = [feature for feature in features if feature != x]
         subtrees = dict()
-        for value in set(d[x]):
-            d_xv = self.__filter_by_v(d, x, value)
-            d_copy = deepcopy(d)
-            d_xv.pop(x)
-            feautres_next = deepcopy(features)
-            feautres_next.remove(x)
-            t = self.__id3(d_xv, d_copy, feautres_next, y, current_depth + 1)
-            subtrees[value] = t
+        # the set is filled in first-occurrence order, which gives the same
+        # iteration order as a set of the whole column would
+        values = list(set(categories[code] for code in rows_by_value))
+        if self.__pool is not None:
+            # subtree outputs are printed in branch order once they are all
+            # back, so the verbose lines come out as in a serial run
+            results = self.__pool.map(
+                build_subtree,
+                [(x, value, features_next) for value in values],
+                chunksize=1,
+            )
+            for value, (subtree, output) in zip(values, results):
+                print(output, end="")
+                subtrees[value] = subtree
+            return Node(x, v, subtrees)
+        for value in values:
+            subtrees[value] = self.__id3(
+                rows_by_value[categories.index(value)],
+                rows,
+                features_next,
+                current_depth + 1,
+            )
         return Node(x, v, subtrees)
 
+    def build_subtree(self, x: str, value: str, features: List) -> Tuple[Node, str]:
+        self.__pool = None
+        column, code = self.__dataset.columns[x], self.__dataset.categories[x].index(
+            value
+        )
+        rows = list(range(self.__dataset.size))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            subtree = self.__id3(
+                [row for row in rows if column[row] == code], rows, features, 1
+            )
+        return subtree, output.getvalue()
+
+    def feature_gains(self, features: List) -> List[float]:
+        rows = list(range(self.__dataset.size))
+        outcomes = [count for _, count in self.__label_counts(rows)]
+        return [self.__ig(rows, x, outcomes) for x in features]
+
     def print_tree(self) -> None:
         print("[BRANCHES]:")
         dfs_print_tree(self.__root)
 
     def fit(self, train_dataset: dict) -> None:
-        self.__root = self.__id3(
-            train_dataset,
-            train_dataset,
-            sorted(list(train_dataset.keys())[:-1]),
-            list(train_dataset.keys())[-1],
-            0,
-        )
+        self.fit_chunks([train_dataset])
 
-    def predict(self, test_dataset: dict) -> None:
-        predictions = list()
-        goal_column = list(test_dataset.keys())[-1]
-        for test_no in range(len(test_dataset[goal_column])):
-            curr_node = self.__root
-            while type(curr_node) != str and curr_node.child_dict is not None:
-                curr_node = curr_node.child_dict[test_dataset[curr_node.x][test_no]]
-            predictions.append(curr_node if type(curr_node) == str else curr_node.x)
-        print(f"[PREDICTIONS]: {' '.join(predictions)}")
-        print(
-            f"[ACCURACY]: {float(sum([1 for predicted, correct in zip(predictions, test_dataset[goal_column]) if predicted == correct]))/len(predictions):.5f}"
+    def fit_chunks(self, train_chunks) -> None:
+        global id3_model
+        self.__dataset = EncodedDataset(train_chunks)
+        if self.__use_numpy:
+            self.__codes = np.array(
+                [
+                    np.frombuffer(self.__dataset.columns[x], dtype=np.intc)
+                    for x in self.__dataset.features
+                ],
+                dtype=np.intp,
+            ).reshape(len(self.__dataset.features), self.__dataset.size)
+            self.__labels = np.frombuffer(self.__dataset.labels, dtype=np.intc)
+        rows = list(range(self.__dataset.size))
+        features = sorted(self.__dataset.features)
+        if self.__n_jobs <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+            self.__root = self.__id3(rows, rows, features, 0)
+        else:
+            # only the root fans out, its subtrees are independent of each other
+            id3_model = self
+            try:
+                with multiprocessing.get_context("fork").Pool(self.__n_jobs) as pool:
+                    self.__pool = pool
+                    self.__root = self.__id3(rows, rows, features, 0)
+            finally:
+                id3_model = None
+                self.__pool = None
+        self.__compiled = CompiledTree(self.__root, self.__dataset, self.__use_numpy)
+
+    def predict(self, test_dataset: dict) -> List[str]:
+        size = len(test_dataset[list(test_dataset.keys())[-1]])
+        encoded = self.__dataset.encode(test_dataset, self.__compiled.features)
+        return self.__compiled.predict(encoded, size)
+
+    def evaluate(self, test_dataset: dict) -> None:
+        self.evaluate_chunks([test_dataset])
+
+    def evaluate_chunks(self, test_chunks) -> None:
+        # predictions are written out chunk by chunk, only the (correct,
+        # predicted) pair counts are kept until the end
+        pair_counts = Counter()
+        print("[PREDICTIONS]:", end="")
+        for chunk in test_chunks:
+            predictions = self.predict(chunk)
+            print("".join([f" {predicted}" for predicted in predictions]), end="")
+            pair_counts.update(zip(chunk[list(chunk.keys())[-1]], predictions))
+        print()
+        correct_count = sum(
+            count
+            for (correct, predicted), count in pair_counts.items()
+            if correct == predicted
         )
+        print(f"[ACCURACY]: {float(correct_count)/sum(pair_counts.values()):.5f}")
 
-        classes = sorted(set(predictions) | set(test_dataset[goal_column]))
-        cm_dim = len(set(predictions) | set(test_dataset[goal_column]))
+        classes = sorted(set(label for pair in pair_counts for label in pair))
+        cm_dim = len(classes)
         confusion_matrix = [[0 for _ in range(cm_dim)] for _ in range(cm_dim)]
-        for predicted, correct in zip(predictions, test_dataset[goal_column]):
-            confusion_matrix[classes.index(correct)][classes.index(predicted)] += 1
+        for (correct, predicted), count in pair_counts.items():
+            confusion_matrix[classes.index(correct)][classes.index(predicted)] += count
         confusion_matrix_str = "\n".join(
             [
                 " ".join([str(confusion_matrix[y][x]) for x in range(cm_dim)])
@@ -161,32 +442,41 @@ class ID3:
         print(f"[CONFUSION_MATRIX]:\n{confusion_matrix_str}")
 
 
-def load_data(train_path: str, test_path: str) -> Tuple[Dict]:
-    with open(train_path, "r", encoding="utf-8") as f:
-        lines = [x.strip().split(",") for x in f.readlines()]
-        train_dataset = dict()
-        for index, feature in enumerate(lines[0]):
-            train_dataset[feature] = [x[index] for x in lines[1:]]
-
-    with open(test_path, "r", encoding="utf-8") as f:
-        lines = [x.strip().split(",") for x in f.readlines()]
-        test_dataset = dict()
-        for index, feature in enumerate(lines[0]):
-            test_dataset[feature] = [x[index] for x in lines[1:]]
-
-    return train_dataset, test_dataset
+def read_chunks(path: str, chunk_size: int = 4096):
+    with open(path, "r", encoding="utf-8") as f:
+        header = f.readline().strip().split(",")
+        while True:
+            lines = [x.strip().split(",") for x in islice(f, chunk_size)]
+            yield {
+                feature: [x[index] for x in lines]
+                for index, feature in enumerate(header)
+            }
+            if len(lines) < chunk_size:
+                break
 
 
 def main():
-    train_dataset, test_dataset = load_data(sys.argv[1], sys.argv[2])
+    args = sys.argv[1:]
+    options = {"--jobs": 1, "--chunk-size": 4096}
+    for option in options:
+        if option in args:
+            position = args.index(option)
+            options[option] = int(args[position + 1])
+            del args[position : position + 2]
+    args = [x for x in args if not x.startswith("--")]
     try:
-        depth = int(sys.argv[3])
+        depth = int(args[2])
     except IndexError:
         depth = -1
-    model = ID3(max_depth=depth, verbose=True)
-    model.fit(train_dataset)
+    model = ID3(
+        max_depth=depth,
+        verbose=True,
+        use_numpy="--no-numpy" not in sys.argv,
+        n_jobs=options["--jobs"],
+    )
+    model.fit_chunks(read_chunks(args[0], options["--chunk-size"]))
     model.print_tree()
-    model.predict(test_dataset)
+    model.evaluate_chunks(read_chunks(args[1], options["--chunk-size"]))
 
 
 if __name__ == "__main__":
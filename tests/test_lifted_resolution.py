@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+solution_path = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "lab2py",
+    "solution.py",
+)
+
+
+def conclusion(lines: list) -> str:
+    with tempfile.TemporaryDirectory() as workdir:
+        clauses_path = os.path.join(workdir, "clauses.txt")
+        with open(clauses_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        output = subprocess.run(
+            [sys.executable, solution_path, "resolution", clauses_path],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    return output.strip().splitlines()[-1]
+
+
+class SharedVariablesTest(unittest.TestCase):
+    def test_shared_variable_must_bind_consistently(self):
+        lines = ["p(a, b)", "q(a)", "g v ~p(X, Y) v ~q(Y)", "g"]
+        self.assertEqual(conclusion(lines), "[CONCLUSION]: g is unknown")
+
+    def test_shared_variable_bound_by_both_literals(self):
+        lines = ["p(a, b)", "q(b)", "g v ~p(X, Y) v ~q(Y)", "g"]
+        self.assertEqual(conclusion(lines), "[CONCLUSION]: g is true")
+
+    def test_distinct_variables_stay_apart(self):
+        lines = ["p(a)", "q(b)", "g v ~p(X) v ~q(Y)", "g"]
+        self.assertEqual(conclusion(lines), "[CONCLUSION]: g is true")
+
+    def test_variable_shared_across_two_steps(self):
+        lines = ["r(a, b)", "r(b, c)", "t(X, Z) v ~r(X, Y) v ~r(Y, Z)", "t(a, a)"]
+        self.assertEqual(conclusion(lines), "[CONCLUSION]: t(a, a) is unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()